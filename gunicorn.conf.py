@@ -0,0 +1,14 @@
+# Gunicorn settings for serving the dashboard:
+#
+#     gunicorn -c gunicorn.conf.py src.app:server
+#
+# The app is imported once in the master and the workers are forked from it,
+# so imports, data loading and template compilation are paid once and the
+# loaded frames are shared copy-on-write. Set LV_LAZY_INIT=1 together with
+# GUNICORN_PRELOAD=0 to instead start each worker without loading anything.
+#
+# The bind address and worker count are left to Gunicorn's own defaults,
+# which follow PORT and WEB_CONCURRENCY.
+import os
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
@@ -1,6 +1,6 @@
 import dash
 import dash_bootstrap_components as dbc
-import altair as alt
+import flask
 import os
 import sys
 
@@ -10,12 +10,30 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, project_root)
 
 from src.cache_config import cache 
-from src.data import load_data, get_unique_years, load_geodata
+from src.data import (
+    GEOMETRY_TOLERANCES,
+    DataStore,
+    get_unique_years,
+    load_dataset,
+    simplify_geometries,
+)
 from src.components import create_layout
-from src.callbacks import register_callbacks
-
-# Enable VegaFusion for Altair charts
-alt.data_transformers.enable("vegafusion")
+from src.compression import register_compression
+from src.callbacks import register_callbacks, get_basemap_url
+from src.basemap import register_basemap_route
+from src.config import (
+    BASEMAP_ROUTE,
+    COMPRESS,
+    COMPRESS_MIN_BYTES,
+    LAZY_INIT,
+    REFRESH_SECONDS,
+    WARMUP,
+)
+from src.warmup import warm_up
+from src.specs import spec_cache
+from src.kpis import register_kpi_route
+from src.metrics import instrument_callbacks, register_metrics_route
+from src.startup import timed
 
 # Initialize the app with Bootstrap styling
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], assets_folder=ASSETS_PATH)
@@ -24,17 +42,81 @@ server = app.server  # Define server at module level for Gunicorn to find
 cache.init_app(server) #Initialize the caching
 
 def main():
-    # Load and preprocess data
-    df = load_data()
-    unique_years = get_unique_years(df)
-    continents = df["continent"].unique()
-    geo_data = load_geodata()
+    # Load the data, reloading it in the background when the files change
+    with timed("load data"):
+        store = DataStore(load_dataset, REFRESH_SECONDS, lazy=LAZY_INIT)
+
+    # Set up the layout, rebuilt on each page load so new years show up
+    def serve_layout():
+        df = store.current().df
+        return create_layout(get_unique_years(df), df["continent"].unique())
+
+    if LAZY_INIT:
+        # Dash checks callbacks against this instead of calling serve_layout
+        # now; the placeholder year only stands in for the slider marks
+        app.validation_layout = create_layout([0], [])
+    app.layout = serve_layout
+
+    # Dash's own routes live under this prefix, and so does the basemap the
+    # specs point at through app.get_relative_path
+    prefix = app.config.routes_pathname_prefix
+    basemap_route = f"{prefix}{BASEMAP_ROUTE.lstrip('/')}"
+
+    # Serve the map shapes once as a static basemap
+    if get_basemap_url(app):
+        with timed("encode basemap"):
+            register_basemap_route(
+                server,
+                lambda tolerance: simplify_geometries(
+                    store.current().geometries, tolerance
+                ),
+                basemap_route,
+                GEOMETRY_TOLERANCES,
+                eager=not LAZY_INIT,
+            )
+
+    # Register callbacks, compiling the chart templates, and time each call
+    instrument_callbacks(app)
+    with timed("register callbacks"):
+        register_callbacks(app, store)
+
+    # Pre-render chart specs so early visitors don't pay for them
+    if WARMUP:
+        with timed("warm up"):
+            warm_up(store.current(), get_basemap_url(app))
+
+    # Drop specs of the replaced data, and re-warm from the background reload
+    def on_swap(data):
+        spec_cache.clear()
+        if WARMUP:
+            warm_up(data, get_basemap_url(app), processes=1)
+
+    store.on_swap(on_swap)
+
+    # Serve the KPI table for reporting and bulk export
+    register_kpi_route(server, store.current)
+
+    # Expose the spec cache counters for sizing it
+    server.add_url_rule(
+        "/_spec-cache", "spec_cache", lambda: flask.jsonify(spec_cache.stats())
+    )
 
-    # Set up the layout
-    app.layout = create_layout(unique_years, continents)
+    # Compress the large JSON responses and let repeat requests revalidate
+    if COMPRESS:
+        register_compression(
+            server,
+            [
+                f"{prefix}_dash-update-component",
+                f"{prefix}_dash-layout",
+                basemap_route,
+                "/kpis",
+            ],
+            COMPRESS_MIN_BYTES,
+        )
 
-    # Register callbacks
-    register_callbacks(app, df, geo_data)
+    # Serve per-callback latency and payload histograms. Registered after
+    # compression so its hooks see the uncompressed responses.
+    register_metrics_route(server, f"{prefix}_dash-update-component")
 
     return app
 
@@ -0,0 +1,120 @@
+import hashlib
+import json
+
+import flask
+import numpy as np
+from shapely.geometry import MultiPolygon
+
+# Name of the TopoJSON object holding the country shapes
+BASEMAP_OBJECT = "countries"
+
+
+def _encode_ring(ring, translate, scale):
+    """Quantize and delta-encode one polygon ring as a TopoJSON arc."""
+    points = np.round((np.asarray(ring.coords)[:, :2] - translate) / scale)
+    points = points.astype(np.int64)
+
+    # Drop points that collapse onto their predecessor once quantized
+    keep = np.r_[True, np.any(np.diff(points, axis=0) != 0, axis=1)]
+    points = points[keep]
+    if len(points) < 4:
+        return None
+    if not np.array_equal(points[0], points[-1]):
+        points = np.vstack([points, points[:1]])
+
+    return np.vstack([points[:1], np.diff(points, axis=0)]).tolist()
+
+
+def build_topology(geometries, quantization=100_000):
+    """Encode a country-indexed GeoSeries of (multi)polygons as TopoJSON.
+
+    Coordinates are quantized and delta-encoded. Arcs are not shared between
+    neighbouring countries, so every ring becomes its own arc.
+    """
+    x0, y0, x1, y1 = geometries.total_bounds
+    scale = np.array(
+        [(x1 - x0) / (quantization - 1) or 1, (y1 - y0) / (quantization - 1) or 1]
+    )
+    translate = np.array([x0, y0])
+
+    arcs = []
+    objects = []
+    for country, geometry in geometries.items():
+        if geometry is None or geometry.is_empty:
+            continue
+        polygons = (
+            geometry.geoms if isinstance(geometry, MultiPolygon) else [geometry]
+        )
+
+        polygon_arcs = []
+        for polygon in polygons:
+            exterior = _encode_ring(polygon.exterior, translate, scale)
+            # Skip polygons whose exterior collapses once quantized
+            if exterior is None:
+                continue
+            holes = [_encode_ring(ring, translate, scale) for ring in polygon.interiors]
+            rings = [exterior] + [hole for hole in holes if hole is not None]
+            polygon_arcs.append([[len(arcs) + i] for i in range(len(rings))])
+            arcs.extend(rings)
+
+        if not polygon_arcs:
+            continue
+        objects.append(
+            {
+                "type": "MultiPolygon",
+                "arcs": polygon_arcs,
+                "properties": {"country": country},
+            }
+        )
+
+    return {
+        "type": "Topology",
+        "transform": {"scale": scale.tolist(), "translate": translate.tolist()},
+        "objects": {
+            BASEMAP_OBJECT: {"type": "GeometryCollection", "geometries": objects}
+        },
+        "arcs": arcs,
+    }
+
+
+def register_basemap_route(
+    server, get_geometries, route, tolerances=(0.0,), max_age=86400, eager=True
+):
+    """Serve the TopoJSON basemap for ``get_geometries(tolerance)`` from ``route``.
+
+    The ``tolerance`` query parameter picks one of ``tolerances``, the
+    simplified geometry tiers, and defaults to the full-resolution 0. Each
+    tier is encoded once per geometries object, up front unless ``eager``
+    is false, and responses carry an ETag and a Cache-Control header so
+    browsers download each tier only once.
+    """
+    encoded = {}
+
+    def encode(tolerance):
+        geometries = get_geometries(tolerance)
+        current = encoded.get(tolerance)
+        if current is None or current[0] is not geometries:
+            body = json.dumps(build_topology(geometries), separators=(",", ":"))
+            body = body.encode()
+            current = encoded[tolerance] = (
+                geometries,
+                body,
+                hashlib.sha256(body).hexdigest(),
+            )
+        return current[1:]
+
+    def basemap():
+        tolerance = flask.request.args.get("tolerance", 0.0, type=float)
+        if tolerance not in tolerances:
+            flask.abort(404)
+        body, etag = encode(tolerance)
+        response = flask.Response(body, mimetype="application/json")
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        return response.make_conditional(flask.request)
+
+    if eager:
+        for tolerance in tolerances:
+            encode(tolerance)
+    server.add_url_rule(route, "basemap", basemap)
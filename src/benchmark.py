@@ -0,0 +1,350 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+import pandas as pd
+from plotly.io.json import to_json_plotly
+
+import src.callbacks as callbacks_module
+from src.callbacks import (
+    CLIENT_SIDE,
+    get_basemap_url,
+    register_callbacks,
+    register_server_view_callbacks,
+)
+from src.data import (
+    GEODATA_PATH,
+    METRIC_LABELS,
+    Dataset,
+    DataStore,
+    _read_data,
+    _split_geodata,
+    enforce_schema,
+    file_version,
+    get_aggregate_cube,
+    get_frame_index,
+    get_unique_years,
+)
+from src.ingest import PARQUET_PATH, RAW_CSV_PATH, ingest_csv
+from src.specs import spec_cache
+
+
+class _Recorder:
+    """Stands in for the Dash app to collect the callback functions."""
+
+    def __init__(self):
+        self.callbacks = {}
+
+    def callback(self, *args, **kwargs):
+        return lambda func: self.callbacks.setdefault(func.__name__, func)
+
+    def clientside_callback(self, *args, **kwargs):
+        pass
+
+    def get_relative_path(self, path):
+        return path
+
+
+def time_call(func, repeat):
+    """Run ``func`` ``repeat`` times and summarise the wall times in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    summary = {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "max": max(times),
+    }
+    return summary, result
+
+
+def bench_loading(repeat):
+    """Time reading the data from the raw CSV, the Parquet file and the GeoJSON.
+
+    Memoization is bypassed, so every run reads the files again.
+    """
+    results = {}
+    if os.path.exists(RAW_CSV_PATH):
+        with tempfile.TemporaryDirectory() as tmp:
+            parquet_path = os.path.join(tmp, "gapminder_data.parquet")
+
+            def from_csv():
+                ingest_csv(RAW_CSV_PATH, parquet_path)
+                return enforce_schema(pd.read_parquet(parquet_path))
+
+            results["load_data_csv"], _ = time_call(from_csv, repeat)
+    version = file_version(PARQUET_PATH)
+    results["load_data_parquet"], _ = time_call(
+        lambda: _read_data.uncached(version), repeat
+    )
+    results["load_geodata"], _ = time_call(_split_geodata, repeat)
+    return results
+
+
+def _copy_name(name, copy):
+    return name if copy == 0 else f"{name} {copy}"
+
+
+def _scale_frame(df, factor):
+    copies = []
+    for copy in range(factor):
+        frame = df.copy()
+        frame["country"] = [_copy_name(name, copy) for name in df["country"]]
+        copies.append(frame)
+    return enforce_schema(pd.concat(copies, ignore_index=True))
+
+
+def scale_dataset(data, factor):
+    """``data`` with every country copied ``factor`` times under new names.
+
+    Copies keep the values and shape of their country, so each year holds
+    ``factor`` times as many rows and the map ``factor`` times as many shapes.
+    """
+    if factor == 1:
+        return data
+    df = _scale_frame(data.df, factor)
+    geo_df = _scale_frame(data.geo_df, factor)
+    geometries = pd.concat(
+        [
+            data.geometries.rename(lambda name: _copy_name(name, copy))
+            for copy in range(factor)
+        ]
+    )
+    get_frame_index(df)
+    get_frame_index(geo_df)
+    get_aggregate_cube(geo_df)
+    return Dataset(df, geo_df, geometries, f"{data.version}:x{factor}", None)
+
+
+def load_frames():
+    """Read the data and map files into a ``Dataset`` with its indexes built."""
+    parquet_version = file_version(PARQUET_PATH)
+    version = f"{parquet_version}:{file_version(GEODATA_PATH)}"
+    df = _read_data.uncached(parquet_version)
+    geo_df, geometries = _split_geodata()
+    get_frame_index(df)
+    get_frame_index(geo_df)
+    get_aggregate_cube(geo_df)
+    return Dataset(df, geo_df, geometries, version, None)
+
+
+def _countries(df, selection):
+    """A one-country and a three-country pick from a continent selection."""
+    rows = df if "(All)" in selection else df[df["continent"].isin(selection)]
+    names = sorted(rows["country"].astype(str).unique())
+    return [names[:1], names[:3]]
+
+
+def sweep(data, quick=False):
+    """Callback names and the argument tuples to call each with.
+
+    Covers the first, middle and last year, "(All)", each continent and a
+    pair of continents, and every metric. The country chart gets one and
+    three countries of each selection. ``quick`` keeps only the last year,
+    "(All)" and the first metric.
+    """
+    years = [int(year) for year in get_unique_years(data.df, step=1)]
+    continents = sorted(data.geo_df["continent"].dropna().unique())
+    metrics = list(METRIC_LABELS)
+    if quick:
+        years, selections, metrics = years[-1:], [["(All)"]], metrics[:1]
+    else:
+        years = sorted({years[0], years[len(years) // 2], years[-1]})
+        selections = [["(All)"], *([c] for c in continents), continents[:2]]
+
+    return {
+        "update_map": [(s, y, None) for s in selections for y in years],
+        "update_bubble": [
+            (s, y, {}, m) for s in selections for y in years for m in metrics
+        ],
+        "update_country_metric": [
+            (m, s, c)
+            for m in metrics
+            for s in selections
+            for c in _countries(data.df, s)
+        ],
+        "update_continent_metric": [(m, s) for m in metrics for s in selections],
+        "update_average_values": [
+            (s, y, m) for s in selections for y in years for m in metrics
+        ],
+        "update_client_view": [(m, None) for m in metrics],
+        "update_view": [
+            (s, y, m, {}, None) for s in selections for y in years for m in metrics
+        ],
+    }
+
+
+def record_callbacks(data):
+    """The callbacks registered for ``data``, keyed by function name.
+
+    Server-rendered views are registered both batched and per output,
+    whichever ``BATCH_CALLBACKS`` is set to, so both can be compared.
+    """
+    app = _Recorder()
+    store = DataStore(lambda: data)
+    register_callbacks(app, store)
+    if not CLIENT_SIDE:
+        batch = callbacks_module.BATCH_CALLBACKS
+        callbacks_module.BATCH_CALLBACKS = not batch
+        try:
+            register_server_view_callbacks(app, store, get_basemap_url(app))
+        finally:
+            callbacks_module.BATCH_CALLBACKS = batch
+    return app.callbacks
+
+
+def bench_callbacks(data, repeat, quick=False):
+    """Time every call of the sweep against the callbacks registered for ``data``.
+
+    The rendered spec cache is switched off so each call builds its output.
+    Objects memoized on the dataset, such as joined geometries, are kept, so
+    the first call of each is reported on its own and ``seconds`` summarises
+    the ``repeat`` calls after it. Returns the calls and the names of the
+    sweep's callbacks that the render mode does not register.
+    """
+    spec_cache.max_entries = 0
+    spec_cache.shared = None
+    spec_cache.clear()
+
+    callbacks = record_callbacks(data)
+
+    calls = []
+    skipped = []
+    for name, arguments in sweep(data, quick).items():
+        callback = callbacks.get(name)
+        if callback is None:
+            skipped.append(name)
+            continue
+        for args in arguments:
+            first, output = time_call(lambda: callback(*args), 1)
+            seconds, _ = time_call(lambda: callback(*args), repeat)
+            calls.append(
+                {
+                    "callback": name,
+                    "args": list(args),
+                    "first": first["min"],
+                    "seconds": seconds,
+                    "bytes": len(to_json_plotly(output)),
+                }
+            )
+    return calls, skipped
+
+
+def summarise(calls):
+    """Per-callback totals over the sweep."""
+    summary = {}
+    for call in calls:
+        entry = summary.setdefault(
+            call["callback"], {"calls": 0, "first": 0.0, "median": 0.0, "bytes": 0}
+        )
+        entry["calls"] += 1
+        entry["first"] += call["first"]
+        entry["median"] += call["seconds"]["median"]
+        entry["bytes"] += call["bytes"]
+    return summary
+
+
+def _git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def run(scales=(1, 10, 100), repeat=5, quick=False):
+    """Run the loading and callback benchmarks and return the JSON-ready report."""
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "scales": list(scales),
+            "repeat": repeat,
+            "quick": quick,
+        },
+        "loading": bench_loading(repeat),
+        "callbacks": [],
+    }
+
+    data = load_frames()
+    for scale in scales:
+        scaled = scale_dataset(data, scale)
+        calls, skipped = bench_callbacks(scaled, repeat, quick)
+        report["callbacks"].append(
+            {
+                "scale": scale,
+                "rows": len(scaled.df),
+                "countries": len(scaled.geometries),
+                "summary": summarise(calls),
+                "skipped": skipped,
+                "calls": calls,
+            }
+        )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time data loading and every chart callback over a sweep of "
+        "inputs and dataset sizes, and write the results as JSON."
+    )
+    parser.add_argument(
+        "--out", default="-", help="File to write the JSON to (default: stdout)."
+    )
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100],
+        help="Dataset size multipliers to run (default: 1 10 100).",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Timed runs per call (default: 5)."
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="Run one year, continent selection and metric only.",
+    )
+    args = parser.parse_args()
+
+    report = run(args.scales, args.repeat, args.quick)
+    if args.out == "-":
+        print(json.dumps(report, indent=2, default=str))
+        return
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    for entry in report["callbacks"]:
+        print(f"scale {entry['scale']}x: {entry['rows']} rows")
+        for name, totals in entry["summary"].items():
+            print(
+                f"  {name:<26} {totals['calls']:>4} calls "
+                f"{totals['median']:>9.3f} s {totals['bytes'] / 2**20:>9.1f} MB"
+            )
+        if entry["skipped"]:
+            print(f"  not registered: {', '.join(entry['skipped'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,64 @@
+import os
+import tempfile
+
 from flask_caching import Cache
 
-#Setting up caching for the app
-cache = Cache(
-    config={
-        'CACHE_TYPE': 'filesystem',
-        'CACHE_DIR': 'tmp'
+# Project root, so the cache location does not depend on the working directory
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Backend shared by every worker process:
+# "filesystem" - pickles under LV_CACHE_DIR (default <project root>/tmp)
+# "shm" - pickles in shared memory (/dev/shm), shared by all workers on a host
+# "redis" - any Redis-compatible server at LV_CACHE_REDIS_URL (needs `redis`)
+# "simple" - an in-process dictionary, not shared between workers
+CACHE_BACKEND = os.environ.get("LV_CACHE_BACKEND", "filesystem")
+
+# Entry lifetime in seconds and maximum number of entries
+CACHE_TIMEOUT = int(os.environ.get("LV_CACHE_TIMEOUT", 3600))
+CACHE_THRESHOLD = int(os.environ.get("LV_CACHE_THRESHOLD", 10000))
+
+
+def cache_settings(backend=CACHE_BACKEND):
+    """Flask-Caching configuration for one of the backends above.
+
+    Redis ignores the entry threshold; bound it with the server's own
+    ``maxmemory`` and an LRU eviction policy instead.
+    """
+    config = {
+        "CACHE_DEFAULT_TIMEOUT": CACHE_TIMEOUT,
+        "CACHE_THRESHOLD": CACHE_THRESHOLD,
     }
-)
\ No newline at end of file
+
+    if backend == "redis":
+        config.update(
+            CACHE_TYPE="RedisCache",
+            CACHE_REDIS_URL=os.environ.get(
+                "LV_CACHE_REDIS_URL", "redis://localhost:6379/0"
+            ),
+            CACHE_KEY_PREFIX="longevity_visualizer:",
+        )
+    elif backend == "shm":
+        shared_memory = (
+            "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        )
+        config.update(
+            CACHE_TYPE="FileSystemCache",
+            CACHE_DIR=os.environ.get(
+                "LV_CACHE_DIR", os.path.join(shared_memory, "longevity_visualizer")
+            ),
+        )
+    elif backend == "simple":
+        config.update(CACHE_TYPE="SimpleCache")
+    elif backend == "filesystem":
+        config.update(
+            CACHE_TYPE="FileSystemCache",
+            CACHE_DIR=os.environ.get("LV_CACHE_DIR", os.path.join(PROJECT_ROOT, "tmp")),
+        )
+    else:
+        raise ValueError(f"Unknown cache backend: {backend!r}")
+
+    return config
+
+
+#Setting up caching for the app
+cache = Cache(config=cache_settings())
@@ -1,14 +1,890 @@
+from dash import ctx, no_update
 from dash.dependencies import Input, Output
+from dash.exceptions import MissingCallbackContextException
+from functools import partial
+import sys
+import numpy as np
 import pandas as pd
-import altair as alt
-import plotly.express as px
-import plotly.graph_objs as go
 import dash_bootstrap_components as dbc
-from src.data import METRIC_LABELS, CONTINENT_COLORS
+from src.data import (
+    METRIC_LABELS,
+    METRIC_EMOJIS,
+    METRIC_UNITS,
+    CONTINENT_COLORS,
+    GEOMETRY_TOLERANCES,
+    category_mask,
+    coordinate_decimals,
+    get_aggregate_cube,
+    get_continent_extents,
+    get_frame_index,
+    join_geometries,
+    read_rows,
+    simplify_geometries,
+)
+import src.data as data_module
+import src.specs as specs_module
+from src.basemap import BASEMAP_OBJECT
+from src.parallel import run_all
+from src.config import (
+    BASEMAP_ROUTE,
+    BATCH_CALLBACKS,
+    BUBBLE_BIN_THRESHOLD,
+    BUBBLE_BINS,
+    LAZY_INIT,
+    MAP_MODE,
+    MAP_WIDTH,
+    RENDER_MODE,
+)
+from src.specs import (
+    code_fingerprint,
+    get_template,
+    normalize_clicked_region,
+    normalize_selection,
+    records,
+    render,
+    spec_cache,
+    templates_fingerprint,
+)
+
+# Filter by year and continent in the browser instead of on the server
+CLIENT_SIDE = RENDER_MODE == "client"
+
+
+def _metric_title(metric_label):
+    """Strip units from a metric label for use in chart titles."""
+    return (
+        metric_label.replace("(USD)", "")
+        .replace("(%)", "")
+        .replace("(tonnes)", "")
+        .strip()
+    )
+
+
+# Chart templates. Each chart is defined over a named, empty dataset and is
+# compiled once per variant; the builders below only fill in the data,
+# titles and scale domains. Altair is imported inside the chart functions so
+# that importing this module stays cheap until a template is compiled.
+
+
+def _map_chart(basemap_url=None):
+    """Life expectancy choropleth over the ``map_data`` dataset.
+
+    Without ``basemap_url`` the dataset holds GeoJSON features. With it, the
+    shapes come from the TopoJSON basemap and ``map_data`` holds only the
+    values to look up by country.
+    """
+    import altair as alt
+
+    if basemap_url:
+        data = alt.topo_feature(basemap_url, BASEMAP_OBJECT)
+    else:
+        data = alt.Data(name="map_data")
+
+    select = alt.selection_point(fields=["country"], name="select_region")
+
+    map = (
+        (
+            alt.Chart(data, width="container", title="Life expectancy")
+            .mark_geoshape(stroke="black", cursor="pointer")
+            .encode(
+                color=alt.condition(
+                    alt.datum.is_empty,
+                    alt.Color("life_exp:Q", title="Life Expectancy"),
+                    alt.value("lightgray"),
+                ),
+                tooltip=[
+                    "country:N",
+                    alt.Tooltip("life_exp:Q", title="Life Expectancy"),
+                ],
+            )
+        )
+        # .properties(width=600, heigth=600)
+        .add_params(select)
+    )
+
+    if basemap_url:
+        # Join the basemap shapes to the selected values in the browser,
+        # keeping only the countries present in the selection
+        map = map.transform_lookup(
+            lookup="properties.country",
+            from_=alt.LookupData(
+                data=alt.Data(name="map_data"),
+                key="country",
+                fields=MAP_COLUMNS,
+            ),
+        ).transform_filter("isValid(datum.country)")
+
+    return map.encode(
+        opacity=alt.condition(select, alt.value(0.8), alt.value(0.2))
+    ).interactive()
+
+
+def _bubble_chart(selected_metric, highlight):
+    """Life expectancy against ``selected_metric`` over the ``bubble_data`` dataset.
+
+    The y domain is a placeholder filled per request. With ``highlight``,
+    countries listed in the ``highlighted`` signal are drawn opaque.
+    """
+    import altair as alt
+
+    metric_label = METRIC_LABELS.get(
+        selected_metric, selected_metric
+    )  # Default to variable name if not found
+
+    encoding = dict(
+        x=alt.X(f"{selected_metric}:Q", title=metric_label),
+        y=alt.Y(
+            "life_exp:Q",
+            title="Life Expectancy",
+            scale=alt.Scale(domain=[0, 1], zero=False),
+        ),
+        size=alt.Size("co2_consump:Q", title="CO2 Consumption"),
+        color=alt.Color(
+            "continent:N",
+            scale=alt.Scale(
+                domain=list(CONTINENT_COLORS.keys()),
+                range=list(CONTINENT_COLORS.values()),
+            ),
+        ),
+        tooltip=[
+            "country:N",
+            "gdp:Q",
+            alt.Tooltip("life_exp:Q", title="Life Expectancy"),
+            alt.Tooltip("co2_consump:Q", title="Co2 Consumption"),
+            "continent:N",
+        ],
+    )
+
+    chart = alt.Chart(alt.Data(name="bubble_data")).mark_circle()
+    if highlight:
+        chart = chart.add_params(alt.param(name="highlighted", value=[]))
+        encoding["opacity"] = alt.condition(
+            "indexof(highlighted, datum.country) != -1",
+            alt.value(0.9),
+            alt.value(0.05),
+        )
 
+    return (
+        chart.encode(**encoding)
+        .properties(
+            width="container",
+            title=f"Life Expectancy against {metric_label}",
+        )
+        .interactive()
+    )
 
-def register_callbacks(app, df, geo_df):
-    """Register all callback functions for the Dash app."""
+
+def _bubble_bins_chart(selected_metric, highlight):
+    """Binned life expectancy against ``selected_metric`` over ``bubble_bins``.
+
+    Each circle is one grid cell, drawn at the mean of its points, sized by
+    the number of points and coloured by its most common continent. With
+    ``highlight``, cells holding a clicked country are drawn opaque.
+    """
+    import altair as alt
+
+    metric_label = METRIC_LABELS.get(selected_metric, selected_metric)
+
+    encoding = dict(
+        x=alt.X(f"{selected_metric}:Q", title=metric_label),
+        y=alt.Y(
+            "life_exp:Q",
+            title="Life Expectancy",
+            scale=alt.Scale(domain=[0, 1], zero=False),
+        ),
+        size=alt.Size("count:Q", title="Countries"),
+        color=alt.Color(
+            "continent:N",
+            title="Main continent",
+            scale=alt.Scale(
+                domain=list(CONTINENT_COLORS.keys()),
+                range=list(CONTINENT_COLORS.values()),
+            ),
+        ),
+        tooltip=[
+            alt.Tooltip("count:Q", title="Countries"),
+            alt.Tooltip("mix:N", title="Continents"),
+            alt.Tooltip(f"{selected_metric}:Q", title=f"Mean {metric_label}"),
+            alt.Tooltip("life_exp:Q", title="Mean Life Expectancy"),
+        ],
+    )
+    if highlight:
+        encoding["opacity"] = alt.condition(
+            "datum.highlighted > 0", alt.value(0.9), alt.value(0.05)
+        )
+
+    return (
+        alt.Chart(alt.Data(name="bubble_bins"))
+        .mark_circle()
+        .encode(**encoding)
+        .properties(
+            width="container",
+            title=f"Life Expectancy against {metric_label}",
+        )
+        .interactive()
+    )
+
+
+def _no_data_chart(selected_metric):
+    """Empty line chart for ``selected_metric``; the title is filled per request."""
+    import altair as alt
+
+    return (
+        alt.Chart(alt.Data(name="empty_data", values=[]))
+        .mark_line()
+        .encode(
+            alt.X("year:O", title="Year"),
+            alt.Y(
+                f"{selected_metric}:Q",
+                title=METRIC_LABELS.get(selected_metric, selected_metric),
+            ),
+        )
+        .properties(title="No data available")
+    )
+
+
+def _country_metric_chart(selected_metric):
+    """Lines and points of ``selected_metric`` per country over ``country_data``."""
+    import altair as alt
+
+    metric_label = METRIC_LABELS.get(selected_metric, selected_metric)
+
+    # Line Chart
+    line = (
+        alt.Chart()
+        .mark_line()
+        .encode(
+            alt.X("year:O", title="Year"),
+            alt.Y(f"{selected_metric}:Q", title=metric_label),
+            alt.Color("country:N", title="Country"),
+            tooltip=["year:Q", f"{selected_metric}:Q", "country:N"],
+        )
+    )
+
+    # Points on the Line
+    points = (
+        alt.Chart()
+        .mark_point(size=50, filled=True)
+        .encode(
+            alt.X("year:O", title="Year"),
+            alt.Y(f"{selected_metric}:Q", title=metric_label),
+            alt.Color("country:N", title="Country"),
+            tooltip=["year:Q", f"{selected_metric}:Q", "country:N"],
+        )
+    )
+
+    # Combine Line + Points over one shared dataset
+    return (
+        alt.layer(line, points, data=alt.Data(name="country_data"))
+        .properties(
+            title=f"{_metric_title(metric_label)} Over Time by Country",
+            width="container",
+        )
+        .interactive()
+    )
+
+
+def _continent_metric_chart(selected_metric):
+    """Average ``selected_metric`` per continent over ``continent_data``.
+
+    The colour domain and range are filled per request with the continents
+    present in the data.
+    """
+    import altair as alt
+
+    metric_label = METRIC_LABELS.get(selected_metric, selected_metric)
+
+    color = alt.Color(
+        "continent:N",
+        scale=alt.Scale(
+            domain=list(CONTINENT_COLORS.keys()),
+            range=list(CONTINENT_COLORS.values()),
+        ),
+        title="Continent",
+    )
+
+    line = (
+        alt.Chart()
+        .mark_line()
+        .encode(
+            alt.X("year:O", title="Year"),
+            alt.Y(f"{selected_metric}:Q", title=f"Avg {metric_label}"),
+            color,
+            tooltip=["year:Q", f"{selected_metric}:Q", "continent:N"],
+        )
+    )
+
+    points = (
+        alt.Chart()
+        .mark_point(size=50, filled=True)
+        .encode(
+            alt.X("year:O", title="Year"),
+            alt.Y(f"{selected_metric}:Q", title=f"Avg {metric_label}"),
+            color,
+            tooltip=["year:Q", f"{selected_metric}:Q", "continent:N"],
+        )
+    )
+
+    return (
+        alt.layer(line, points, data=alt.Data(name="continent_data"))
+        .properties(
+            title=f"Average {_metric_title(metric_label)} Over Time by Continent",
+            width="container",
+        )
+        .interactive()
+    )
+
+
+def _client_view_chart(selected_metric, basemap_url, years, continents):
+    """Cards, map and bubble chart filtered in the browser, over ``attributes``.
+
+    The year and continent are Vega params bound to a slider and a select
+    box, so changing them never reaches the server. Map shapes are looked up
+    from the TopoJSON basemap at ``basemap_url``.
+    """
+    import altair as alt
+
+    metric_label = METRIC_LABELS.get(selected_metric, selected_metric)
+
+    year = alt.param(
+        name="year",
+        value=years[0],
+        bind=alt.binding_range(min=years[0], max=years[-1], step=1, name="Year "),
+    )
+    continent = alt.param(
+        name="continent",
+        value="(All)",
+        bind=alt.binding_select(options=["(All)", *continents], name="Continent "),
+    )
+    in_continent = "(continent == '(All)' || datum.continent == continent)"
+    selected = f"datum.year == year && {in_continent}"
+
+    # Cards: averages for the selected year and change from the previous one
+    def card(field, header, value_format):
+        change = "(datum.current - datum.previous) / datum.previous * 100"
+        unit = f" {METRIC_UNITS[field]}" if METRIC_UNITS.get(field) else ""
+        text = alt.Chart().mark_text(fontSize=30, dy=-10).encode(text="value:N")
+        footer = alt.Chart().mark_text(fontSize=14, dy=22).encode(text="change:N")
+        return (
+            alt.layer(text, footer)
+            .transform_filter(
+                f"(datum.year == year || datum.year == year - 1) && {in_continent}"
+            )
+            .transform_calculate(
+                current=f"datum.year == year ? datum.{field} : null",
+                previous=f"datum.year == year - 1 ? datum.{field} : null",
+            )
+            .transform_aggregate(current="mean(current)", previous="mean(previous)")
+            .transform_calculate(
+                value=f"format(datum.current, '{value_format}') + '{unit}'",
+                change=(
+                    "isValid(datum.previous) && isValid(datum.current)"
+                    " && datum.previous != 0"
+                    f" ? ({change} > 0 ? '▲ ' : '🔻 ')"
+                    f" + format(abs({change}), '.2f') + '% from ' + (year - 1)"
+                    " : 'No data for ' + (year - 1)"
+                ),
+            )
+            .properties(width=220, height=60, title=header)
+        )
+
+    metric_emoji = METRIC_EMOJIS.get(selected_metric, "📊")
+    cards = alt.hconcat(
+        card("life_exp", "🌍 Average Longevity", ".2f"),
+        card("population", "🗿 Average Population", ",.0f"),
+        card(
+            selected_metric,
+            f"{metric_emoji} Average {metric_label}",
+            ",.0f" if selected_metric == "gdp" else ".2f",
+        ),
+    )
+
+    select = alt.selection_point(fields=["country"], name="select_region")
+
+    map = (
+        alt.Chart(width=420, height=300, title="Life expectancy")
+        .transform_filter(selected)
+        .transform_lookup(
+            lookup="country",
+            from_=alt.LookupData(
+                data=alt.topo_feature(basemap_url, BASEMAP_OBJECT),
+                key="properties.country",
+            ),
+            as_="geo",
+        )
+        .mark_geoshape(stroke="black", cursor="pointer")
+        .encode(
+            shape="geo:G",
+            color=alt.condition(
+                alt.datum.is_empty,
+                alt.Color("life_exp:Q", title="Life Expectancy"),
+                alt.value("lightgray"),
+            ),
+            tooltip=[
+                "country:N",
+                alt.Tooltip("life_exp:Q", title="Life Expectancy"),
+            ],
+            opacity=alt.condition(select, alt.value(0.8), alt.value(0.2)),
+        )
+        .add_params(select)
+    )
+
+    bubble = (
+        alt.Chart(
+            width=420, height=300, title=f"Life Expectancy against {metric_label}"
+        )
+        .transform_filter(selected)
+        .mark_circle()
+        .encode(
+            x=alt.X(f"{selected_metric}:Q", title=metric_label),
+            y=alt.Y(
+                "life_exp:Q", title="Life Expectancy", scale=alt.Scale(zero=False)
+            ),
+            size=alt.Size("co2_consump:Q", title="CO2 Consumption"),
+            color=alt.Color(
+                "continent:N",
+                scale=alt.Scale(
+                    domain=list(CONTINENT_COLORS.keys()),
+                    range=list(CONTINENT_COLORS.values()),
+                ),
+            ),
+            tooltip=[
+                "country:N",
+                "gdp:Q",
+                alt.Tooltip("life_exp:Q", title="Life Expectancy"),
+                alt.Tooltip("co2_consump:Q", title="Co2 Consumption"),
+                "continent:N",
+            ],
+            # Countries clicked on the map stay opaque
+            opacity=alt.condition(select, alt.value(0.9), alt.value(0.05)),
+        )
+    )
+
+    return alt.vconcat(
+        cards,
+        alt.hconcat(map, bubble).resolve_scale(color="independent"),
+        data=alt.Data(name="attributes"),
+    ).add_params(year, continent)
+
+
+def compile_templates(basemap_url=None):
+    """Compile every chart template up front so no request pays for it."""
+    for tolerance in GEOMETRY_TOLERANCES:
+        url = basemap_tier_url(basemap_url, tolerance)
+        get_template(("map", url), partial(_map_chart, url))
+    for selected_metric in METRIC_LABELS:
+        for highlight in (False, True):
+            get_template(
+                ("bubble", selected_metric, highlight),
+                partial(_bubble_chart, selected_metric, highlight),
+            )
+            get_template(
+                ("bubble_bins", selected_metric, highlight),
+                partial(_bubble_bins_chart, selected_metric, highlight),
+            )
+        get_template(
+            ("no_data", selected_metric), partial(_no_data_chart, selected_metric)
+        )
+        get_template(
+            ("country_metric", selected_metric),
+            partial(_country_metric_chart, selected_metric),
+        )
+        get_template(
+            ("continent_metric", selected_metric),
+            partial(_continent_metric_chart, selected_metric),
+        )
+
+
+# Spec builders. Each filters the data for one set of callback inputs and
+# renders the matching template.
+
+# Columns sent to the browser for each chart
+MAP_COLUMNS = ["country", "life_exp", "is_empty"]
+BUBBLE_COLUMNS = ["country", "continent", "life_exp", "co2_consump", "gdp"]
+
+
+# Columns sent once to the browser-filtered view, plus the selected metric
+CLIENT_VIEW_COLUMNS = [
+    "country",
+    "continent",
+    "year",
+    "life_exp",
+    "population",
+    "is_empty",
+    "co2_consump",
+    "gdp",
+]
+
+
+def build_no_data_spec(selected_metric, title):
+    """Render the empty line chart for ``selected_metric`` with ``title``."""
+    template = get_template(
+        ("no_data", selected_metric), partial(_no_data_chart, selected_metric)
+    )
+    return render(template, title=title)
+
+
+def basemap_tier_url(basemap_url, tolerance):
+    """URL of the basemap simplified to ``tolerance``, or None without a basemap."""
+    if basemap_url is None:
+        return None
+    return f"{basemap_url}?tolerance={tolerance:g}"
+
+
+def map_tolerance(geo_df, geometries, selected_continent, width=None):
+    """Coarsest geometry tolerance that stays under half a pixel on the map.
+
+    The map is fitted to the selected continents, so a pixel covers their
+    longitude span divided by the map ``width``, which defaults to
+    ``MAP_WIDTH``.
+    """
+    extents = get_continent_extents(geo_df, geometries)
+    selection = normalize_selection(selected_continent)
+    if "(All)" not in selection:
+        extents = extents[extents.index.isin(selection)]
+    span = extents["east"].max() - extents["west"].min() if len(extents) else 360
+    pixel = span / (width or MAP_WIDTH)
+    return max((t for t in GEOMETRY_TOLERANCES if t <= pixel / 2), default=0.0)
+
+
+def build_map_spec(
+    geo_df,
+    geometries,
+    selected_continent,
+    selected_year,
+    basemap_url=None,
+    tolerance=0.0,
+):
+    """Build the choropleth spec for the selected continent(s) and year.
+
+    With ``basemap_url`` the shapes are left to the TopoJSON basemap and the
+    spec carries only the values to join in the browser. ``tolerance`` picks
+    the simplified geometry tier, inline or from the basemap.
+    """
+    dff = get_frame_index(geo_df).rows(selected_year, selected_continent)
+
+    if dff.empty:
+        # return go.Figure()
+        return {}
+
+    if basemap_url:
+        # Shapes come from the cached basemap; only the values are sent
+        values = records(dff, MAP_COLUMNS)
+    else:
+        # Attach the country shapes only now that the rows are filtered
+        values = join_geometries(
+            dff[MAP_COLUMNS],
+            simplify_geometries(geometries, tolerance),
+            coordinate_decimals(tolerance),
+        )
+
+    url = basemap_tier_url(basemap_url, tolerance)
+    template = get_template(("map", url), partial(_map_chart, url))
+    return render(
+        template,
+        data={"map_data": values},
+        title=f"Life expectancy in {selected_year}",
+    )
+
+
+def bubble_rows(data, selected_continent, selected_year, selected_metric):
+    """Rows of ``data`` the bubble chart shows: one year of the selected continents.
+
+    In-memory frames are sliced through their index. Rows read from the
+    partitioned store are already filtered and new on every call, so they
+    are returned as they are rather than indexed.
+    """
+    if data.store is None:
+        return get_frame_index(data.df).rows(selected_year, selected_continent)
+    columns = list(dict.fromkeys(["year", *BUBBLE_COLUMNS, selected_metric]))
+    return read_rows(data, columns, [selected_year], selected_continent)
+
+
+def metric_rows(data, selected_metric, selected_continent=None):
+    """Rows of ``data`` with every year of one metric, optionally per continent."""
+    columns = ["year", "continent", "country", selected_metric]
+    return read_rows(data, columns, continents=selected_continent)
+
+
+def _bin_index(values, bins):
+    """Index of the equal-width bin, out of ``bins``, each of ``values`` falls in."""
+    low, high = values.min(), values.max()
+    span = (high - low) or 1.0
+    return np.minimum(((values - low) / span * bins).astype(np.int64), bins - 1)
+
+
+def bubble_bins(dff, selected_metric, highlighted=(), bins=BUBBLE_BINS):
+    """Bin the bubble chart rows into a ``bins`` x ``bins`` grid.
+
+    The grid spans ``selected_metric`` against life expectancy. Returns one
+    record per non-empty cell with the mean position of its points, their
+    count, the most common continent, the continent mix as text and how
+    many of the ``highlighted`` countries it holds.
+    """
+    points = dff.dropna(subset=[selected_metric, "life_exp"])
+    x = points[selected_metric].to_numpy(dtype="float64")
+    y = points["life_exp"].to_numpy(dtype="float64")
+    cell = _bin_index(x, bins) * bins + _bin_index(y, bins)
+    # The metric can be life expectancy itself
+    axes = list(dict.fromkeys([selected_metric, "life_exp"]))
+
+    grouped = pd.DataFrame(
+        {
+            selected_metric: x,
+            "life_exp": y,
+            "highlighted": points["country"].isin(highlighted).to_numpy(),
+        }
+    ).groupby(cell)
+    cells = grouped[axes].mean().astype("float32")
+    cells["highlighted"] = grouped["highlighted"].sum()
+
+    # Points per continent in each cell, most common first
+    mix = (
+        points.groupby([cell, points["continent"].to_numpy()])
+        .size()
+        .unstack(fill_value=0)
+    )
+    cells["count"] = mix.sum(axis=1)
+    cells["continent"] = mix.idxmax(axis=1)
+    cells["mix"] = [
+        ", ".join(
+            f"{continent} {count / total:.0%}"
+            for continent, count in counts.sort_values(ascending=False).items()
+            if count
+        )
+        for (_, counts), total in zip(mix.iterrows(), cells["count"])
+    ]
+    return records(cells, [*axes, "count", "continent", "mix", "highlighted"])
+
+
+def build_bubble_spec(dff, clicked_region, selected_metric):
+    """Build the bubble chart spec, highlighting any countries clicked on the map.
+
+    ``dff`` holds the rows of the selected year and continents, as returned
+    by ``bubble_rows``. Above ``BUBBLE_BIN_THRESHOLD`` rows the points are
+    binned on the server, so the spec size stays bounded by the grid rather
+    than the row count.
+    """
+    bool_check = bool(clicked_region.get("select_region"))
+
+    if dff.empty:
+        return {}
+
+    # Find min and max for consistent y-axis scaling
+    y_min = dff["life_exp"].min() * 0.95  # 5% buffer
+    y_max = dff["life_exp"].max() * 1.05  # 5% buffer
+
+    signals = None
+    if bool_check:
+        signals = {"highlighted": clicked_region["select_region"]["country"]}
+
+    if len(dff) > BUBBLE_BIN_THRESHOLD:
+        highlighted = signals["highlighted"] if signals else ()
+        template = get_template(
+            ("bubble_bins", selected_metric, bool_check),
+            partial(_bubble_bins_chart, selected_metric, bool_check),
+        )
+        return render(
+            template,
+            data={"bubble_bins": bubble_bins(dff, selected_metric, highlighted)},
+            scales={"y": {"domain": [float(y_min), float(y_max)]}},
+        )
+
+    columns = list(dict.fromkeys(BUBBLE_COLUMNS + [selected_metric]))
+    template = get_template(
+        ("bubble", selected_metric, bool_check),
+        partial(_bubble_chart, selected_metric, bool_check),
+    )
+    return render(
+        template,
+        data={"bubble_data": records(dff, columns)},
+        scales={"y": {"domain": [float(y_min), float(y_max)]}},
+        signals=signals,
+    )
+
+
+def build_country_metric_spec(
+    df, selected_metric, selected_continent, selected_country
+):
+    """Build the per-country line chart spec for the selected metric."""
+    filtered_df = df
+
+    # `` Filter by continent if specific continents are selected
+    if "(All)" not in selected_continent:
+        filtered_df = filtered_df[
+            category_mask(filtered_df["continent"], selected_continent)
+        ]
+
+    # Ensure selected_country is a list
+    if isinstance(selected_country, str):
+        selected_country = [selected_country]
+
+    # Check if selected_country is not "(All)", and filter
+    if "(All)" not in selected_country:
+        filtered_df = filtered_df[
+            category_mask(filtered_df["country"], selected_country)
+        ]
+
+    # ✅ Check if any of the selected countries actually exist in the dataset
+    # If none of the selected countries are present, return empty plot
+    countries_in_data = df["country"].cat.categories
+    if not any(country in countries_in_data for country in selected_country):
+        return build_no_data_spec(
+            selected_metric, "No data available for selected country"
+        )
+
+    # Handle empty filtered dataframe case
+    if filtered_df.empty:
+        return build_no_data_spec(selected_metric, "No data available")
+
+    template = get_template(
+        ("country_metric", selected_metric),
+        partial(_country_metric_chart, selected_metric),
+    )
+    return render(
+        template,
+        data={
+            "country_data": records(
+                filtered_df, ["year", "country", selected_metric]
+            )
+        },
+    )
+
+
+def build_continent_metric_spec(df, selected_metric, selected_continent):
+    """Build the per-continent average line chart spec for the selected metric."""
+    filtered_df = df
+
+    # Filter by selected continents
+    if "(All)" not in selected_continent:
+        filtered_df = filtered_df[
+            category_mask(filtered_df["continent"], selected_continent)
+        ]
+
+    if filtered_df.empty:
+        return build_no_data_spec(selected_metric, "No data available")
+
+    # Compute Average Metric per Continent
+    continent_avg = (
+        filtered_df.groupby(["year", "continent"], observed=True)[selected_metric]
+        .mean()
+        .reset_index()
+    )
+
+    unique_continents = continent_avg["continent"].unique().tolist()
+
+    # Ensure only colors for selected continents are used
+    selected_continent_colors = {
+        k: v for k, v in CONTINENT_COLORS.items() if k in unique_continents
+    }
+
+    template = get_template(
+        ("continent_metric", selected_metric),
+        partial(_continent_metric_chart, selected_metric),
+    )
+    return render(
+        template,
+        data={
+            "continent_data": records(
+                continent_avg, ["year", "continent", selected_metric]
+            )
+        },
+        scales={
+            "color": {
+                "domain": list(selected_continent_colors.keys()),
+                "range": list(selected_continent_colors.values()),
+            }
+        },
+    )
+
+
+def get_basemap_url(app):
+    """URL of the TopoJSON basemap when a view needs it, otherwise None."""
+    if MAP_MODE == "topojson" or CLIENT_SIDE:
+        return app.get_relative_path(BASEMAP_ROUTE)
+    return None
+
+
+def _client_view_template(geo_df, selected_metric, basemap_url):
+    years = sorted(int(year) for year in geo_df["year"].unique())
+    continents = sorted(geo_df["continent"].dropna().unique())
+    return get_template(
+        ("client_view", selected_metric, basemap_url, years[0], years[-1], *continents),
+        partial(
+            _client_view_chart,
+            selected_metric,
+            basemap_url,
+            [years[0], years[-1]],
+            continents,
+        ),
+    )
+
+
+def build_client_view_spec(geo_df, selected_metric, basemap_url, tolerance=0.0):
+    """Build the browser-filtered cards, map and bubble chart for a metric.
+
+    The spec carries every (country, year) row, so only a metric change
+    needs a new one. ``tolerance`` picks the simplified basemap tier.
+    """
+    columns = list(dict.fromkeys(CLIENT_VIEW_COLUMNS + [selected_metric]))
+    url = basemap_tier_url(basemap_url, tolerance)
+    return render(
+        _client_view_template(geo_df, selected_metric, url),
+        data={"attributes": records(geo_df, columns)},
+    )
+
+
+# Spec cache keys. Each is built from the normalized callback inputs, so
+# equivalent selections share one cached spec.
+
+
+def map_key(selected_continent, selected_year, tolerance=0.0):
+    return ("map", normalize_selection(selected_continent), selected_year, tolerance)
+
+
+def bubble_key(selected_continent, selected_year, clicked_region, selected_metric):
+    # The binning settings decide between point and binned specs, and the
+    # templates of both are always compiled, so they key the spec themselves
+    return (
+        "bubble",
+        normalize_selection(selected_continent),
+        selected_year,
+        normalize_clicked_region(clicked_region),
+        selected_metric,
+        BUBBLE_BIN_THRESHOLD,
+        BUBBLE_BINS,
+    )
+
+
+def country_metric_key(selected_metric, selected_continent, selected_country):
+    return (
+        "country_metric",
+        selected_metric,
+        normalize_selection(selected_continent),
+        normalize_selection(selected_country),
+    )
+
+
+def client_view_key(selected_metric, tolerance=0.0):
+    return ("client_view", selected_metric, tolerance)
+
+
+def continent_metric_key(selected_metric, selected_continent):
+    return (
+        "continent_metric",
+        selected_metric,
+        normalize_selection(selected_continent),
+    )
+
+
+def register_callbacks(app, store):
+    """Register all callback functions for the Dash app.
+
+    Every callback reads the frames from ``store.current()`` when it runs, so
+    a refreshed dataset is picked up without re-registering. In the dataset,
+    ``geo_df`` holds the map attributes without geometry; ``geometries`` holds
+    one shape per country and is only joined in when the map spec is built.
+    """
 
     # Callback to update country dropdown options based on selected continent
     @app.callback(
@@ -16,22 +892,23 @@ def register_callbacks(app, df, geo_df):
         [Input("continent-dropdown", "value"), Input("map-graph", "signalData")],
     )
     def set_countries_options(selected_continent, clicked_region):
-        print(clicked_region)
-        print("clicked_region")
+        df = store.current().df
         bool_check = clicked_region.get("select_region")
         # if clicked_region and "country" in clicked_region["select_region"]:
         if bool_check:
             if "(All)" in selected_continent:
                 filtered_df = df
                 options = [{"label": "(All)", "value": "(All)"}] + [
-                    {"label": i, "value": i} for i in filtered_df["country"].unique()
+                    {"label": i, "value": i}
+                    for i in sorted(filtered_df["country"].unique())
                 ]
                 value = clicked_region["select_region"]["country"]
                 return options, value
             else:
-                filtered_df = df[df["continent"].isin(selected_continent)]
+                filtered_df = df[category_mask(df["continent"], selected_continent)]
                 options = [{"label": "(All)", "value": "(All)"}] + [
-                    {"label": i, "value": i} for i in filtered_df["country"].unique()
+                    {"label": i, "value": i}
+                    for i in sorted(filtered_df["country"].unique())
                 ]
                 value = clicked_region["select_region"]["country"]
                 return options, value
@@ -39,11 +916,12 @@ def register_callbacks(app, df, geo_df):
             if "(All)" in selected_continent:
                 filtered_df = df
             else:
-                filtered_df = df[df["continent"].isin(selected_continent)]
+                filtered_df = df[category_mask(df["continent"], selected_continent)]
             options = [{"label": "(All)", "value": "(All)"}] + [
-                {"label": i, "value": i} for i in filtered_df["country"].unique()
+                {"label": i, "value": i}
+                for i in sorted(filtered_df["country"].unique())
             ]
-            value = filtered_df["country"].unique()[0]
+            value = min(filtered_df["country"].unique())
             return options, value
 
     # Callback to set default country dropdown value
@@ -54,49 +932,187 @@ def register_callbacks(app, df, geo_df):
     # def set_countries_value(available_options):
     #     return available_options[1]["value"]
 
-    # Callback to update the metric cards
+    basemap_url = get_basemap_url(app)
+    if not LAZY_INIT:
+        compile_templates(basemap_url)
+
+    # Report the width of the map once the page has rendered, to pick the
+    # detail of its shapes
+    app.clientside_callback(
+        """
+        function(_) {
+            const map = document.getElementById("map-graph");
+            return (map && map.offsetWidth) || window.innerWidth;
+        }
+        """,
+        Output("map-width", "data"),
+        Input("map-width", "id"),
+    )
+
+    if CLIENT_SIDE:
+        register_client_view_callbacks(app, store, basemap_url)
+    else:
+        register_server_view_callbacks(app, store, basemap_url)
+
+    # Version shared cache entries by the code and settings that shape the
+    # specs, and by every template compiled so far unless they compile on
+    # first use
+    fingerprint = code_fingerprint(
+        sys.modules[__name__],
+        specs_module,
+        data_module,
+        settings={
+            "MAP_MODE": MAP_MODE,
+            "basemap_url": basemap_url,
+            "RENDER_MODE": RENDER_MODE,
+            "BUBBLE_BIN_THRESHOLD": BUBBLE_BIN_THRESHOLD,
+            "BUBBLE_BINS": BUBBLE_BINS,
+            "GEOMETRY_TOLERANCES": GEOMETRY_TOLERANCES,
+        },
+    )
+    if LAZY_INIT:
+        spec_cache.namespace = fingerprint
+    else:
+        spec_cache.namespace = f"{templates_fingerprint()}-{fingerprint}"
+
     @app.callback(
+        Output("country-metric-chart", "spec"),
         [
-            Output("average_life", "children"),
-            Output("average_pop", "children"),
-            Output("dynamic-metric-card", "children"),
+            Input("metric-dropdown-bottom", "value"),
+            Input("continent-dropdown", "value"),
+            Input("country-dropdown", "value"),
         ],
+    )
+    def update_country_metric(selected_metric, selected_continent, selected_country):
+        data = store.current()
+        return spec_cache.get_or_build(
+            country_metric_key(selected_metric, selected_continent, selected_country),
+            lambda: build_country_metric_spec(
+                metric_rows(data, selected_metric),
+                selected_metric,
+                selected_continent,
+                selected_country,
+            ),
+            data.version,
+        )
+
+    # Callback to update the continent-level metric chart
+    @app.callback(
+        Output("continent-metric-chart", "spec"),
         [
-            Input("continent-dropdown", "value"),
-            Input("year-slider-top", "value"),
             Input("metric-dropdown-bottom", "value"),
+            Input("continent-dropdown", "value"),
         ],
     )
-    def update_average_values(selected_continent, selected_year, selected_metric):
-        # Filter dataset based on selected continent(s)
-        filtered_df = geo_df[geo_df["year"] == selected_year]
+    def update_continent_metric(selected_metric, selected_continent):
+        data = store.current()
+        return spec_cache.get_or_build(
+            continent_metric_key(selected_metric, selected_continent),
+            lambda: build_continent_metric_spec(
+                metric_rows(data, selected_metric, selected_continent),
+                selected_metric,
+                selected_continent,
+            ),
+            data.version,
+        )
 
-        # Filter dataset for previous year
-        previous_years =geo_df[geo_df["year"] == selected_year - 1]
+    # Metric definitions to map for the dropdown menu.
+    METRIC_DEFINITIONS = {
+        "gdp": "GDP per capita is the total value of goods and services a country produces (Gross Domestic Product) divided by its population. It measures the average economic output per person, giving an idea of a country's standard of living.",
+        "life_exp": "Life expectancy indicates the number of years a person would be expected to live based on current health, living and mortality conditions.",
+        "hdi_index": "A measure of a country's overall development, considering life expectancy, education (literacy and schooling), and income per capita. It ranges from 0 to 1, with higher values indicating better development.",
+        "co2_consump": "The total amount of carbon dioxide emissions produced by a country, region, or individual, usually from burning fossil fuels for energy, transportation, and industry. It is often measured in metric tons per capita.",
+        "services": "Percentage of the workforce engaged in service industries. This includes workers who are part of the economy that provides non-tangible goods, such as healthcare, education, finance, retail, entertainment, and tourism, rather than physical products.",
+    }
 
-        if "(All)" not in selected_continent:
-            filtered_df = filtered_df[filtered_df["continent"].isin(selected_continent)]
-            previous_years = previous_years[
-                previous_years["continent"].isin(selected_continent)
-            ]
+    @app.callback(
+        Output("metric-definition", "children"),
+        Input("metric-dropdown-bottom", "value"),
+    )
+    # Adds the mapped metric definitions for the drop down menu.
+    def update_metric_definition(selected_metric):
+        return METRIC_DEFINITIONS.get(selected_metric, "Definition not available.")
+
+
+def _triggered():
+    """Ids of the inputs that triggered the running callback, as "id.property".
+
+    None on the initial call, or outside a request, when every output is due.
+    """
+    try:
+        changed = ctx.triggered_prop_ids
+    except MissingCallbackContextException:
+        return None
+    return set(changed) or None
+
+
+def _plain(value):
+    """``value`` with every Dash component replaced by its JSON dict.
+
+    Plotly's orjson encoder rejects components and then walks the whole
+    response in Python, which is slow next to a large chart spec.
+    """
+    if hasattr(value, "to_plotly_json"):
+        value = value.to_plotly_json()
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+def register_client_view_callbacks(app, store, basemap_url):
+    """Register the callback for the browser-filtered cards, map and bubble chart."""
+    if not LAZY_INIT:
+        # Other detail tiers compile on first use
+        data = store.current()
+        url = basemap_tier_url(
+            basemap_url, map_tolerance(data.geo_df, data.geometries, "(All)")
+        )
+        for selected_metric in METRIC_LABELS:
+            _client_view_template(data.geo_df, selected_metric, url)
+
+    @app.callback(
+        Output("map-graph", "spec"),
+        [Input("metric-dropdown-bottom", "value"), Input("map-width", "data")],
+    )
+    def update_client_view(selected_metric, map_width):
+        data = store.current()
+        tolerance = map_tolerance(data.geo_df, data.geometries, "(All)", map_width)
+        return spec_cache.get_or_build(
+            client_view_key(selected_metric, tolerance),
+            lambda: build_client_view_spec(
+                data.geo_df, selected_metric, basemap_url, tolerance
+            ),
+            data.version,
+        )
+
+
+def register_server_view_callbacks(app, store, basemap_url):
+    """Register the server-rendered cards, map and bubble chart callbacks.
+
+    With ``BATCH_CALLBACKS`` one callback updates all of them, so a year or
+    continent change is one request served from one dataset snapshot.
+    """
+
+    # The metric cards
+    def average_values(data, selected_continent, selected_year, selected_metric):
+        # Look up this year's averages and changes in the aggregate cube
+        cube = get_aggregate_cube(data.geo_df)
+        kpis = cube.kpis([selected_continent], [selected_year]).set_index("metric")
 
         # Handle case where no data is available
-        if filtered_df.empty:
+        if kpis.empty or kpis["rows"].iloc[0] == 0:
             return "No Data Available", "No Data Available", "No Data Available"
 
         # Compute Averages
-        avg_life = filtered_df["life_exp"].mean()
-        avg_pop = filtered_df["population"].mean()
-        avg_dynamic_metric = filtered_df[selected_metric].mean()
-
-        # Compute preceding year averages
-        prev_avg_life = previous_years["life_exp"].mean()
-        prev_avg_pop = previous_years["population"].mean()
-        prev_avg_dynamic_metric = previous_years[selected_metric].mean()
-
-        # Helper function to calculate percentage change
-        def calculate_change(current, previous, previous_year):
-            if pd.isna(previous) or previous == 0 or pd.isna(current):
+        avg_life = kpis.at["life_exp", "mean"]
+        avg_pop = kpis.at["population", "mean"]
+        avg_dynamic_metric = kpis.at[selected_metric, "mean"]
+
+        # Helper function to format the change from the preceding year
+        def calculate_change(change, previous_year):
+            if pd.isna(change):
                 return f"No data for {previous_year}", {
                     "color": "#6c757d",
                     "textAlign": "center",
@@ -104,7 +1120,6 @@ def register_callbacks(app, df, geo_df):
                     "backgroundColor": "#f8f9fa",
                 }
 
-            change = ((current - previous) / previous) * 100
             arrow = "▲" if change > 0 else "🔻"
             color = "green" if change > 0 else "red"
             bg_color = "#d4edda" if change > 0 else "#f8d7da"
@@ -120,13 +1135,13 @@ def register_callbacks(app, df, geo_df):
 
         # Compute percentage changes
         percentage_change_life, style_life = calculate_change(
-            avg_life, prev_avg_life, selected_year - 1
+            kpis.at["life_exp", "change"], selected_year - 1
         )
         percentage_change_gdp, style_gdp = calculate_change(
-            avg_pop, prev_avg_pop, selected_year - 1
+            kpis.at["population", "change"], selected_year - 1
         )
         percentage_change_dynamic_metric, style_dynamic_metric = calculate_change(
-            avg_dynamic_metric, prev_avg_dynamic_metric, selected_year - 1
+            kpis.at[selected_metric, "change"], selected_year - 1
         )
 
         # cards to return
@@ -168,26 +1183,12 @@ def register_callbacks(app, df, geo_df):
         ]
 
         # Emoji for dynamic metric card
-        METRIC_EMOJIS = {
-            "gdp": "💰",  # GDP per capita
-            "life_exp": "🌍",  # Life expectancy
-            "hdi_index": "📚",  # Human Development Index
-            "co2_consump": "🌿",  # CO2 Consumption
-            "services": "🛠️",  # Service Workers Percentage
-        }
         metric_emoji = METRIC_EMOJIS.get(selected_metric, "📊")
 
         # Metric name for dynamic card
         metric_label = METRIC_LABELS.get(selected_metric, selected_metric)
 
         # Metric units for dynamic card
-        METRIC_UNITS = {
-            "gdp": "",
-            "life_exp": "years",
-            "hdi_index": "",
-            "co2_consump": "",
-            "services": "%",
-        }
         metric_unit = METRIC_UNITS.get(selected_metric, "")
 
         if selected_metric == "gdp":
@@ -219,441 +1220,136 @@ def register_callbacks(app, df, geo_df):
         # Format the output
         return _avg_life, _avg_pop, _avg_dynamic_metric
 
-    # Callback to update the map chart
-    @app.callback(
-        Output("map-graph", "spec"),
-        [Input("continent-dropdown", "value"), Input("year-slider-top", "value")],
-    )
-    def update_map(selected_continent, selected_year):
-        if "(All)" in selected_continent:
-            dff = geo_df[geo_df["year"] == selected_year]
-        else:
-            dff = geo_df[
-                (geo_df["year"] == selected_year)
-                & (geo_df["continent"].isin(selected_continent))
-            ]
-
-        if dff.empty:
-            # return go.Figure()
-            return {}
-
-        select = alt.selection_point(fields=["country"], name="select_region")
-
-        map = (
-            (
-                alt.Chart(
-                    dff, width="container", title=f"Life expectancy in {selected_year}"
-                )
-                .mark_geoshape(stroke="black", cursor="pointer")
-                .encode(
-                    color=alt.condition(
-                        alt.datum.is_empty,
-                        alt.Color("life_exp:Q", title="Life Expectancy"),
-                        alt.value("lightgray"),
-                    ),
-                    tooltip=[
-                        "country",
-                        alt.Tooltip("life_exp", title="Life Expectancy"),
-                    ],
-                )
-            )
-            # .properties(width=600, heigth=600)
-            .add_params(select)
+    # The map chart
+    def map_spec(data, selected_continent, selected_year, map_width):
+        tolerance = map_tolerance(
+            data.geo_df, data.geometries, selected_continent, map_width
         )
-
-        map_with_selection = map.encode(
-            opacity=alt.condition(select, alt.value(0.8), alt.value(0.2))
+        return spec_cache.get_or_build(
+            map_key(selected_continent, selected_year, tolerance),
+            lambda: build_map_spec(
+                data.geo_df,
+                data.geometries,
+                selected_continent,
+                selected_year,
+                basemap_url,
+                tolerance,
+            ),
+            data.version,
         )
 
-        return map_with_selection.interactive().to_dict(format="vega")
-
-    # Callback to update the bubble chart
-    @app.callback(
-        Output("bubble-graph", "spec"),
-        [
-            Input("continent-dropdown", "value"),
-            Input("year-slider-top", "value"),
-            Input("map-graph", "signalData"),
-            Input("metric-dropdown-bottom", "value"),
-        ],
-    )
-    def update_bubble(
-        selected_continent, selected_year, clicked_region, selected_metric
+    # The bubble chart
+    def bubble_spec(
+        data, selected_continent, selected_year, clicked_region, selected_metric
     ):
-
-        bool_check = clicked_region.get("select_region")
-
-        metric_label = METRIC_LABELS.get(
-            selected_metric, selected_metric
-        )  # Default to variable name if not found
-
-        metric_label_title = (
-            metric_label.replace("(USD)", "")
-            .replace("(%)", "")
-            .replace("(tonnes)", "")
-            .strip()
+        return spec_cache.get_or_build(
+            bubble_key(
+                selected_continent, selected_year, clicked_region, selected_metric
+            ),
+            lambda: build_bubble_spec(
+                bubble_rows(
+                    data, selected_continent, selected_year, selected_metric
+                ),
+                clicked_region,
+                selected_metric,
+            ),
+            data.version,
         )
 
-        if bool_check:
-            if "(All)" in selected_continent:
-                dff = df[df["year"] == selected_year]
-            else:
-                dff = df[
-                    (df["year"] == selected_year)
-                    & (df["continent"].isin(selected_continent))
-                ]
-
-            if dff.empty:
-                return {}
-
-            # **Define fixed colors for continents**
-            continent_colors = {
-                "Africa": "#1f77b4",  # Blue
-                "Asia": "#ff7f0e",  # Orange
-                "Europe": "#2ca02c",  # Green
-                "North America": "#d62728",  # Red
-                "Oceania": "#9467bd",  # Purple
-                "South America": "#8c564b",  # Brown
-            }
-
-            # Find min and max for consistent y-axis scaling
-            y_min = dff["life_exp"].min() * 0.95  # 5% buffer
-            y_max = dff["life_exp"].max() * 1.05  # 5% buffer
-
-            countries = clicked_region["select_region"]["country"]
-            chart = (
-                alt.Chart(dff)
-                .mark_circle()
-                .encode(
-                    # x=alt.X("gdp:Q", title="GDP"),
-                    x=alt.X(selected_metric, title=metric_label),
-                    y=alt.Y(
-                        "life_exp:Q",
-                        title="Life Expectancy",
-                        scale=alt.Scale(domain=[y_min, y_max], zero=False),
-                    ),
-                    size=alt.Size("co2_consump:Q", title="CO2 Consumption"),
-                    color=alt.Color(
-                        "continent:N",
-                        scale=alt.Scale(
-                            domain=list(continent_colors.keys()),
-                            range=list(continent_colors.values()),
-                        ),
-                    ),
-                    tooltip=[
-                        "country:N",
-                        "gdp:Q",
-                        alt.Tooltip("life_exp", title="Life Expectancy"),
-                        alt.Tooltip("co2_consump", title="Co2 Consumption"),
-                        "continent:N",
-                    ],
-                    opacity=alt.condition(
-                        alt.expr.if_(
-                            alt.expr.indexof(countries, alt.datum.country) != -1,
-                            True,
-                            False,
-                        ),
-                        alt.value(0.9),
-                        alt.value(0.05),
-                    ),
-                )
-                .properties(
-                    width="container",
-                    title=f"Life Expectancy against {metric_label}",
-                )
-                .interactive()
-            )
-        else:
-            if "(All)" in selected_continent:
-                dff = df[df["year"] == selected_year]
-            else:
-                dff = df[
-                    (df["year"] == selected_year)
-                    & (df["continent"].isin(selected_continent))
-                ]
-
-            if dff.empty:
-                return {}
-
-            # **Define fixed colors for continents**
-            continent_colors = {
-                "Africa": "#1f77b4",  # Blue
-                "Asia": "#ff7f0e",  # Orange
-                "Europe": "#2ca02c",  # Green
-                "North America": "#d62728",  # Red
-                "Oceania": "#9467bd",  # Purple
-                "South America": "#8c564b",  # Brown
-            }
-
-            # Find min and max for consistent y-axis scaling
-            y_min = dff["life_exp"].min() * 0.95  # 5% buffer
-            y_max = dff["life_exp"].max() * 1.05  # 5% buffer
-
-            chart = (
-                alt.Chart(dff)
-                .mark_circle()
-                .encode(
-                    # x=alt.X("gdp:Q", title="GDP"),
-                    x=alt.X(selected_metric, title=metric_label),
-                    y=alt.Y(
-                        "life_exp:Q",
-                        title="Life Expectancy",
-                        scale=alt.Scale(domain=[y_min, y_max], zero=False),
-                    ),
-                    size=alt.Size("co2_consump:Q", title="CO2 Consumption"),
-                    color=alt.Color(
-                        "continent:N",
-                        scale=alt.Scale(
-                            domain=list(continent_colors.keys()),
-                            range=list(continent_colors.values()),
-                        ),
-                    ),
-                    tooltip=[
-                        "country:N",
-                        "gdp:Q",
-                        alt.Tooltip("life_exp", title="Life Expectancy"),
-                        alt.Tooltip("co2_consump", title="Co2 Consumption"),
-                        "continent:N",
-                    ],
-                )
-                .properties(
-                    width="container",
-                    title=f"Life Expectancy against {metric_label}",
+    card_outputs = [
+        Output("average_life", "children"),
+        Output("average_pop", "children"),
+        Output("dynamic-metric-card", "children"),
+    ]
+    continent = Input("continent-dropdown", "value")
+    year = Input("year-slider-top", "value")
+    metric = Input("metric-dropdown-bottom", "value")
+    clicked = Input("map-graph", "signalData")
+    width = Input("map-width", "data")
+
+    if BATCH_CALLBACKS:
+
+        # Callback to update the cards, map and bubble chart together,
+        # skipping the outputs none of the changed inputs feed
+        @app.callback(
+            card_outputs
+            + [Output("map-graph", "spec"), Output("bubble-graph", "spec")],
+            [continent, year, metric, clicked, width],
+        )
+        def update_view(
+            selected_continent,
+            selected_year,
+            selected_metric,
+            clicked_region,
+            map_width,
+        ):
+            data = store.current()
+            changed = _triggered()
+
+            def due(*inputs):
+                return changed is None or any(
+                    f"{i.component_id}.{i.component_property}" in changed
+                    for i in inputs
                 )
-                .interactive()
-            )
-        return chart.to_dict(format="vega")
 
-    @app.callback(
-        Output("country-metric-chart", "spec"),
-        [
-            Input("metric-dropdown-bottom", "value"),
-            Input("continent-dropdown", "value"),
-            Input("country-dropdown", "value"),
-        ],
-    )
-    def update_country_metric(selected_metric, selected_continent, selected_country):
-        filtered_df = df
-
-        # `` Filter by continent if specific continents are selected
-        if "(All)" not in selected_continent:
-            filtered_df = filtered_df[filtered_df["continent"].isin(selected_continent)]
-
-        # Ensure selected_country is a list
-        if isinstance(selected_country, str):
-            selected_country = [selected_country]
-
-        # Check if selected_country is not "(All)", and filter
-        if "(All)" not in selected_country:
-            filtered_df = filtered_df[filtered_df["country"].isin(selected_country)]
-
-        # ✅ Check if any of the selected countries actually exist in the dataset
-        # If none of the selected countries are present, return empty plot
-        countries_in_data = df["country"].unique()
-        if not any(country in countries_in_data for country in selected_country):
-            return (
-                alt.Chart(
-                    pd.DataFrame(
-                        {
-                            "year": [],
-                            selected_metric: [],
-                        }
+            def cards():
+                return _plain(
+                    average_values(
+                        data, selected_continent, selected_year, selected_metric
                     )
                 )
-                .mark_line()
-                .encode(
-                    alt.X("year:O", title="Year"),
-                    alt.Y(
-                        selected_metric,
-                        title=METRIC_LABELS.get(selected_metric, selected_metric),
-                    ),
-                    # alt.Color("country:N", title="Country"),
-                )
-                .properties(title="No data available for selected country")
-                .to_dict(format="vega")
-            )
-
-        # Handle empty filtered dataframe case
-        if filtered_df.empty:
-            return (
-                alt.Chart(pd.DataFrame({"year": [], selected_metric: []}))
-                .mark_line()
-                .encode(
-                    alt.X("year:O", title="Year"),
-                    alt.Y(
-                        selected_metric,
-                        title=METRIC_LABELS.get(selected_metric, selected_metric),
-                    ),
-                    alt.Color("country:N", title="Country"),
-                )
-                .properties(title="No data available")
-                .to_dict(format="vega")
-            )
-
-        # Prepare metric label and title
-        metric_label = METRIC_LABELS.get(selected_metric, selected_metric)
-        metric_label_title = (
-            metric_label.replace("(USD)", "")
-            .replace("(%)", "")
-            .replace("(tonnes)", "")
-            .strip()
-        )
-
-        # Line Chart
-        line = (
-            alt.Chart(filtered_df)
-            .mark_line()
-            .encode(
-                alt.X("year:O", title="Year"),
-                alt.Y(selected_metric, title=metric_label),
-                alt.Color("country:N", title="Country"),
-                tooltip=["year", selected_metric, "country"],
-            )
-        )
-
-        # Points on the Line
-        points = (
-            alt.Chart(filtered_df)
-            .mark_point(size=50, filled=True)
-            .encode(
-                alt.X("year:O", title="Year"),
-                alt.Y(selected_metric, title=metric_label),
-                alt.Color("country:N", title="Country"),
-                tooltip=["year", selected_metric, "country"],
-            )
-        )
-
-        # Combine Line + Points
-        alt_chart = (
-            (line + points)
-            .properties(
-                title=f"{metric_label_title} Over Time by Country", width="container"
-            )
-            .interactive()
-        )
-
-        return alt_chart.to_dict(format="vega")
-
-    # Callback to update the continent-level metric chart
-    @app.callback(
-        Output("continent-metric-chart", "spec"),
-        [
-            Input("metric-dropdown-bottom", "value"),
-            Input("continent-dropdown", "value"),
-        ],
-    )
-    def update_continent_metric(selected_metric, selected_continent):
-        filtered_df = df
-
-        # Filter by selected continents
-        if "(All)" not in selected_continent:
-            filtered_df = filtered_df[filtered_df["continent"].isin(selected_continent)]
 
-        metric_label = METRIC_LABELS.get(selected_metric, selected_metric)
+            def map_update():
+                return map_spec(data, selected_continent, selected_year, map_width)
 
-        metric_label_title = (
-            metric_label.replace("(USD)", "")
-            .replace("(%)", "")
-            .replace("(tonnes)", "")
-            .strip()
-        )
-
-        if filtered_df.empty:
-            return (
-                alt.Chart(pd.DataFrame({"year": [], selected_metric: []}))
-                .mark_line()
-                .encode(
-                    alt.X("year:O", title="Year"),
-                    alt.Y(selected_metric, title=metric_label),
-                    alt.Color("continent:N", title="Continent"),
+            def bubble_update():
+                return bubble_spec(
+                    data,
+                    selected_continent,
+                    selected_year,
+                    clicked_region,
+                    selected_metric,
                 )
-                .properties(title="No data available")
-                .to_dict(format="vega")
-            )
-
-        # Compute Average Metric per Continent
-        continent_avg = (
-            filtered_df.groupby(["year", "continent"])[selected_metric]
-            .mean()
-            .reset_index()
-        )
 
-        unique_continents = continent_avg["continent"].unique().tolist()
+            # Render the due outputs, side by side with RENDER_THREADS
+            renders = [
+                render
+                for render, inputs in (
+                    (cards, (continent, year, metric)),
+                    (map_update, (continent, year, width)),
+                    (bubble_update, (continent, year, clicked, metric)),
+                )
+                if due(*inputs)
+            ]
+            rendered = dict(zip(renders, run_all(*renders)))
+            return rendered.get(cards, [no_update] * 3) + [
+                rendered.get(map_update, no_update),
+                rendered.get(bubble_update, no_update),
+            ]
 
-        continent_colors = {
-            "Africa": "#1f77b4",  # Blue
-            "Asia": "#ff7f0e",  # Orange
-            "Europe": "#2ca02c",  # Green
-            "North America": "#d62728",  # Red
-            "Oceania": "#9467bd",  # Purple
-            "South America": "#8c564b",  # Brown
-        }
+        return
 
-        # Ensure only colors for selected continents are used
-        selected_continent_colors = {
-            k: v for k, v in continent_colors.items() if k in unique_continents
-        }
-
-        line = (
-            alt.Chart(continent_avg)
-            .mark_line()
-            .encode(
-                alt.X("year:O", title="Year"),
-                alt.Y(selected_metric, title=f"Avg {metric_label}"),
-                alt.Color(
-                    "continent:N",
-                    scale=alt.Scale(
-                        domain=list(selected_continent_colors.keys()),
-                        range=list(selected_continent_colors.values()),
-                    ),
-                    title="Continent",
-                ),
-                tooltip=["year", selected_metric, "continent"],
-            )
+    # Callback to update the metric cards
+    @app.callback(card_outputs, [continent, year, metric])
+    def update_average_values(selected_continent, selected_year, selected_metric):
+        return average_values(
+            store.current(), selected_continent, selected_year, selected_metric
         )
 
-        points = (
-            alt.Chart(continent_avg)
-            .mark_point(size=50, filled=True)
-            .encode(
-                alt.X("year:O", title="Year"),
-                alt.Y(selected_metric, title=f"Avg {metric_label}"),
-                alt.Color(
-                    "continent:N",
-                    scale=alt.Scale(
-                        domain=list(selected_continent_colors.keys()),
-                        range=list(selected_continent_colors.values()),
-                    ),
-                    title="Continent",
-                ),
-                tooltip=["year", selected_metric, "continent"],
-            )
-        )
+    # Callback to update the map chart
+    @app.callback(Output("map-graph", "spec"), [continent, year, width])
+    def update_map(selected_continent, selected_year, map_width):
+        return map_spec(store.current(), selected_continent, selected_year, map_width)
 
-        alt_chart = (
-            (line + points)
-            .properties(
-                title=f"Average {metric_label_title} Over Time by Continent",
-                width="container",
-            )
-            .interactive()
+    # Callback to update the bubble chart
+    @app.callback(Output("bubble-graph", "spec"), [continent, year, clicked, metric])
+    def update_bubble(
+        selected_continent, selected_year, clicked_region, selected_metric
+    ):
+        return bubble_spec(
+            store.current(),
+            selected_continent,
+            selected_year,
+            clicked_region,
+            selected_metric,
         )
-
-        return alt_chart.to_dict(format="vega")
-
-    # Metric definitions to map for the dropdown menu.
-    METRIC_DEFINITIONS = {
-        "gdp": "GDP per capita is the total value of goods and services a country produces (Gross Domestic Product) divided by its population. It measures the average economic output per person, giving an idea of a country's standard of living.",
-        "life_exp": "Life expectancy indicates the number of years a person would be expected to live based on current health, living and mortality conditions.",
-        "hdi_index": "A measure of a country's overall development, considering life expectancy, education (literacy and schooling), and income per capita. It ranges from 0 to 1, with higher values indicating better development.",
-        "co2_consump": "The total amount of carbon dioxide emissions produced by a country, region, or individual, usually from burning fossil fuels for energy, transportation, and industry. It is often measured in metric tons per capita.",
-        "services": "Percentage of the workforce engaged in service industries. This includes workers who are part of the economy that provides non-tangible goods, such as healthcare, education, finance, retail, entertainment, and tourism, rather than physical products.",
-    }
-
-    @app.callback(
-        Output("metric-definition", "children"),
-        Input("metric-dropdown-bottom", "value"),
-    )
-    # Adds the mapped metric definitions for the drop down menu.
-    def update_metric_definition(selected_metric):
-        return METRIC_DEFINITIONS.get(selected_metric, "Definition not available.")
@@ -4,6 +4,7 @@ import dash_bootstrap_components as dbc
 import dash_vega_components as dvc
 from datetime import datetime
 from src.data import METRIC_OPTIONS
+from src.config import RENDER_MODE
 
 
 def create_title():
@@ -24,8 +25,11 @@ def create_title():
 
 
 def create_top_controls(unique_years, continents):
-    """Create the top section controls (continent dropdown and year slider)."""
-    return [
+    """Create the top section controls (continent dropdown and year slider).
+
+    In client render mode the year slider lives inside the chart instead.
+    """
+    controls = [
         dcc.Markdown("**Select Continent(s):**", style={"color": "white"}),
         dcc.Dropdown(
             id="continent-dropdown",
@@ -36,6 +40,11 @@ def create_top_controls(unique_years, continents):
             clearable=False,
             style={"color": "black", "marginBottom": "1rem"},
         ),
+    ]
+    if RENDER_MODE == "client":
+        return controls
+
+    return controls + [
         dcc.Markdown("**Select Year:**", style={"color": "white"}),
         html.Div(
             [
@@ -176,7 +185,14 @@ def create_charts():
     type = 'circle'
     )
 
+    # One browser-filtered view holding the cards, map and bubble chart
+    client_view = dcc.Loading(
+        dvc.Vega(id="map-graph", spec={}, signalsToObserve=["select_region"]),
+        type="circle",
+    )
+
     return {
+        "client_view": client_view,
         "map_chart": map_chart,
         "bubble_chart": bubble_chart,
         "country_metric_chart": country_metric_chart,
@@ -184,6 +200,43 @@ def create_charts():
     }
 
 
+def create_overview(charts):
+    """Create the rows holding the cards, map and bubble chart.
+
+    In client render mode they are a single browser-filtered Vega view.
+    """
+    if RENDER_MODE == "client":
+        return [
+            dbc.Row(
+                dbc.Col([charts["client_view"]], className="mb-4"),
+                className="g-3",
+            )
+        ]
+
+    return [
+        # First row for 3 cards
+        create_cards(),
+        # Second row for 2 charts
+        dbc.Row(
+            [
+                dbc.Col(
+                    [charts["map_chart"]],
+                    xs=12,
+                    md=6,
+                    className="mb-4",
+                ),
+                dbc.Col(
+                    [charts["bubble_chart"]],
+                    xs=12,
+                    md=6,
+                    className="mb-4",
+                ),
+            ],
+            className="g-3",
+        ),
+    ]
+
+
 def create_layout(unique_years, continents):
     """Create the main dashboard layout."""
     # Initialize chart containers
@@ -204,6 +257,8 @@ def create_layout(unique_years, continents):
     # Create layout
     return html.Div(
         [
+            # Width of the map in pixels, reported by the browser
+            dcc.Store(id="map-width"),
             dbc.Container(
                 [
                     dbc.Row(
@@ -232,26 +287,8 @@ def create_layout(unique_years, continents):
                             # Second Column: Charts
                             dbc.Col(
                                 [
-                                    # First row for 3 cards
-                                    create_cards(),
-                                    # Second row for 2 charts
-                                    dbc.Row(
-                                        [
-                                            dbc.Col(
-                                                [charts["map_chart"]],
-                                                xs=12,
-                                                md=6,
-                                                className="mb-4",
-                                            ),
-                                            dbc.Col(
-                                                [charts["bubble_chart"]],
-                                                xs=12,
-                                                md=6,
-                                                className="mb-4",
-                                            ),
-                                        ],
-                                        className="g-3",
-                                    ),
+                                    # Cards, map and bubble chart
+                                    *create_overview(charts),
                                     # Third row for 2 charts
                                     dbc.Row(
                                         [
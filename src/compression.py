@@ -0,0 +1,108 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+import flask
+
+try:
+    import brotli
+except ImportError:  # optional; responses fall back to gzip
+    brotli = None
+
+
+def compress(body, encoding):
+    """Compress ``body`` with ``encoding``, "br" or "gzip"."""
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def choose_encoding(accept_encodings):
+    """Best encoding the client accepts: "br" if available, then "gzip", or None."""
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+class CompressedBodies:
+    """LRU of compressed response bodies keyed by (ETag, encoding).
+
+    Identical callback inputs produce byte-identical responses, so a repeat
+    response is compressed once. Bounded by the total compressed size.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+    def get_or_compress(self, etag, encoding, body):
+        key = (etag, encoding)
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+                return compressed
+
+        compressed = compress(body, encoding)
+        if len(compressed) > self.max_bytes:
+            return compressed
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = compressed
+                self.bytes += len(compressed)
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+        return compressed
+
+
+def register_compression(server, paths, min_bytes=1024, cache_mb=32):
+    """Compress and validate successful responses to ``paths`` on ``server``.
+
+    Every such response gets an ETag hashed from its body, unless the view
+    set one, with the content coding appended when it is compressed, since
+    each coding is a different representation. A GET or HEAD whose
+    If-None-Match holds the ETag gets an empty 304. Other methods, such as
+    the POSTed Dash callbacks, only get the ETag. Bodies of at least
+    ``min_bytes`` are compressed with brotli or gzip, as the client accepts.
+    """
+    bodies = CompressedBodies(cache_mb * 2**20)
+    paths = set(paths)
+
+    @server.after_request
+    def compress_response(response):
+        request = flask.request
+        if (
+            request.path not in paths
+            or response.status_code != 200
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+
+        body = response.get_data()
+        identity_etag, _ = response.get_etag()
+        if identity_etag is None:
+            identity_etag = hashlib.sha256(body).hexdigest()
+        response.vary.add("Accept-Encoding")
+
+        encoding = choose_encoding(request.accept_encodings)
+        if len(body) < min_bytes:
+            encoding = None
+        etag = identity_etag if encoding is None else f"{identity_etag}-{encoding}"
+        response.set_etag(etag)
+
+        if request.method in ("GET", "HEAD") and etag in request.if_none_match:
+            not_modified = flask.Response(status=304, headers=response.headers)
+            del not_modified.headers["Content-Length"]
+            return not_modified
+
+        if encoding is not None:
+            response.set_data(bodies.get_or_compress(identity_etag, encoding, body))
+            response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,65 @@
+import os
+
+# Runtime settings, overridable through environment variables
+
+# How the choropleth gets its country shapes:
+# "inline" embeds the shapes in every map spec, "topojson" serves them once
+# from BASEMAP_ROUTE and sends only the life expectancy values per update.
+MAP_MODE = os.environ.get("LV_MAP_MODE", "inline")
+
+BASEMAP_ROUTE = "/basemap.topojson"
+
+# Map width in pixels assumed until the browser reports the real one, and
+# when warming up. Picks the geometry detail tier of the map.
+MAP_WIDTH = int(os.environ.get("LV_MAP_WIDTH", 640))
+
+# Where the cards, map and bubble chart are filtered:
+# "server" re-renders them on every year or continent change, "client" sends
+# all rows once and filters in the browser with Vega params.
+RENDER_MODE = os.environ.get("LV_RENDER_MODE", "server")
+
+# Update the server-rendered cards, map and bubble chart from one callback,
+# so a year or continent change is one request instead of three
+BATCH_CALLBACKS = os.environ.get("LV_BATCH_CALLBACKS", "1") == "1"
+
+# Threads per process that render the outputs of the batched callback side
+# by side. 1 renders them one after another on the request thread.
+RENDER_THREADS = int(os.environ.get("LV_RENDER_THREADS", 1))
+
+# Per-process LRU cache of rendered chart specs
+SPEC_CACHE_ENTRIES = int(os.environ.get("LV_SPEC_CACHE_ENTRIES", 2048))
+SPEC_CACHE_MB = float(os.environ.get("LV_SPEC_CACHE_MB", 256))
+
+# Pre-render chart specs for every year, continent and metric at startup
+WARMUP = os.environ.get("LV_WARMUP", "0") == "1"
+
+# Above this many points per year the bubble chart is binned on the server
+# into a BUBBLE_BINS x BUBBLE_BINS grid instead of sending every point
+BUBBLE_BIN_THRESHOLD = int(os.environ.get("LV_BUBBLE_BIN_THRESHOLD", 2000))
+BUBBLE_BINS = int(os.environ.get("LV_BUBBLE_BINS", 40))
+
+# Rows per chunk, and per Parquet row group, when ingesting the raw CSV
+INGEST_CHUNK_ROWS = int(os.environ.get("LV_INGEST_CHUNK_ROWS", 100_000))
+
+# Seconds between checks for changed data files, which are then reloaded
+# without a restart. 0 disables the checks.
+REFRESH_SECONDS = float(os.environ.get("LV_REFRESH_SECONDS", 60))
+
+# Where the callbacks read the Gapminder rows from:
+# "memory" loads the whole frame into every worker, "mmap" memory-maps Arrow
+# IPC copies of the frames so workers share one copy in the page cache, and
+# "partitioned" keeps only the (year, continent, country) keys in memory and
+# reads the rows each chart needs from a Hive-partitioned Parquet dataset
+# split by PARTITION_BY.
+DATA_SOURCE = os.environ.get("LV_DATA_SOURCE", "memory")
+PARTITION_BY = tuple(os.environ.get("LV_PARTITION_BY", "year").split(","))
+
+# Defer loading the data and compiling chart templates to the first request,
+# so workers start quickly. Leave off when the app is preloaded in the
+# gunicorn master, which then does the work once before forking.
+LAZY_INIT = os.environ.get("LV_LAZY_INIT", "0") == "1"
+
+# Compress callback, layout, basemap and KPI responses of at least
+# COMPRESS_MIN_BYTES with brotli, when installed, or gzip
+COMPRESS = os.environ.get("LV_COMPRESS", "1") == "1"
+COMPRESS_MIN_BYTES = int(os.environ.get("LV_COMPRESS_MIN_BYTES", 1024))
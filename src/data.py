@@ -1,40 +1,117 @@
 import pandas as pd
-import geopandas as gpd
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import functools
+import json
+import logging
+import math
+import threading
+import time
+import weakref
+from collections import namedtuple
 from src.cache_config import cache
+from src.config import DATA_SOURCE, PARTITION_BY
+from src.metrics import timed_phase
+from src.ingest import (
+    PARQUET_PATH,
+    RAW_CSV_PATH,
+    file_version,
+    publish_versioned,
+    refresh,
+    write_partitioned,
+)
 
 import os
-import pandas as pd
 
 
-@cache.memoize()
+logger = logging.getLogger(__name__)
+
+# Column types shared by every loaded frame
+CATEGORY_COLUMNS = ["country", "continent"]
+FLOAT_COLUMNS = [
+    "life_exp",
+    "hdi_index",
+    "co2_consump",
+    "gdp",
+    "services",
+]
+# Populations reach 1.4e9, past the 7 significant digits of float32
+FLOAT64_COLUMNS = ["population"]
+
+
+def enforce_schema(df):
+    """Normalize ``df`` to categorical names, int16 years and float32 metrics.
+
+    Populations stay float64 so the averages on the cards are exact.
+
+    Frames from the raw CSV, the Parquet file and the GeoJSON all go through
+    here so the callbacks see the same dtypes whichever path loaded them.
+    Rows are sorted by (year, continent, country) so ``FrameIndex`` can serve
+    selections as contiguous slices.
+    """
+    df = df.copy()
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category").cat.remove_unused_categories()
+    if "year" in df.columns:
+        df["year"] = df["year"].astype("int16")
+    for column in FLOAT_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("float32")
+    for column in FLOAT64_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("float64")
+    order = [c for c in ["year", "continent", "country"] if c in df.columns]
+    return df.sort_values(order, kind="stable").reset_index(drop=True)
+
+
+def category_mask(column, selected):
+    """Boolean mask of the rows of a categorical ``column`` whose value is selected.
+
+    The selection is translated to category codes once, so the per-row work
+    is an integer comparison rather than a string one.
+    """
+    if isinstance(selected, str):
+        selected = [selected]
+    codes = column.cat.categories.get_indexer(list(selected))
+    return np.isin(column.cat.codes.to_numpy(), codes[codes >= 0])
+
+
+def json_values(df):
+    """Return ``df`` as object columns of plain Python values for JSON specs.
+
+    float32 values are widened through their shortest decimal form, so 0.0471
+    is sent as 0.0471 rather than 0.04710000008344650. Missing values become
+    None.
+    """
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype == np.float32:
+            df[column] = df[column].to_numpy().astype(str).astype("float64")
+    df = df.astype(object)
+    return df.where(df.notna(), None)
+
+
+GEODATA_PATH = "data/processed/gapminder.json"
+
+
 def load_data():
-    """Load and preprocess the Gapminder dataset, saving it as a Parquet file."""
-    parquet_path = "data/processed/gapminder_data.parquet"
-
-    # Load the parquet data
-    if os.path.exists(parquet_path):
-        return pd.read_parquet(parquet_path)
-
-    # Preprocessing raw data
-    df = pd.read_csv("data/raw/gapminder_data_graphs.csv")
-    df = df.dropna(
-        subset=[
-            "country",
-            "continent",
-            "year",
-            "life_exp",
-            "hdi_index",
-            "co2_consump",
-            "gdp",
-            "services",
-        ]
-    )
+    """Load the Gapminder dataset, refreshing its Parquet file from the raw CSV.
+
+    The frame is memoized per version of the Parquet file, so workers share
+    it until the data changes.
+    """
+    if os.path.exists(RAW_CSV_PATH):
+        refresh(RAW_CSV_PATH, PARQUET_PATH)
+    return _read_data(file_version(PARQUET_PATH))
 
-    # Save to Parquet for future use
-    os.makedirs("data/processed", exist_ok=True)  # Ensure the directory exists
-    df.to_parquet(parquet_path, engine="pyarrow", index=False)
 
-    return df
+@cache.memoize()
+def _read_data(version):
+    """Read the Parquet file; ``version`` only keys the memoized frame."""
+    return enforce_schema(pd.read_parquet(PARQUET_PATH))
 
 
 def get_unique_years(df, step=4):
@@ -59,6 +136,23 @@ METRIC_LABELS = {
     "services": "Service Workers Percentage (%)",
 }
 
+# Emoji and units shown on the metric cards
+METRIC_EMOJIS = {
+    "gdp": "💰",  # GDP per capita
+    "life_exp": "🌍",  # Life expectancy
+    "hdi_index": "📚",  # Human Development Index
+    "co2_consump": "🌿",  # CO2 Consumption
+    "services": "🛠️",  # Service Workers Percentage
+}
+
+METRIC_UNITS = {
+    "gdp": "",
+    "life_exp": "years",
+    "hdi_index": "",
+    "co2_consump": "",
+    "services": "%",
+}
+
 # Continent color mapping for consistent visualization
 CONTINENT_COLORS = {
     "Africa": "#1f77b4",  # Blue
@@ -70,8 +164,601 @@ CONTINENT_COLORS = {
 }
 
 
-@cache.memoize()
 def load_geodata():
-    geo_df = gpd.read_file("data/processed/gapminder.json")
+    """Load the map data as per-(country, year) attributes and per-country geometry.
+
+    The GeoJSON repeats each country's polygon on every year row, so the
+    geometry is split off into a country-indexed GeoSeries and the attributes
+    are returned as a plain DataFrame.
+    """
+    return _read_geodata(file_version(GEODATA_PATH))
+
+
+@cache.memoize()
+def _read_geodata(version):
+    """Read the GeoJSON; ``version`` only keys the memoized frames."""
+    return _split_geodata()
+
+
+def _split_geodata():
+    import geopandas as gpd
+
+    geo_df = gpd.read_file(GEODATA_PATH)
+
+    geometries = geo_df.drop_duplicates("country").set_index("country").geometry
+    attributes = pd.DataFrame(geo_df.drop(columns=geo_df.geometry.name))
+
+    return enforce_schema(attributes), geometries
+
+
+def _serialize_geometries(geometries, decimals=None):
+    """Pre-serialize every country's geometry as a GeoJSON geometry mapping.
+
+    With ``decimals``, coordinates are first rounded to that many decimal
+    places, which roughly halves the size of the JSON.
+    """
+    if decimals is not None:
+        import shapely
+
+        geometries = geometries.copy()
+        geometries[:] = shapely.transform(
+            geometries.values, lambda coords: np.round(coords, decimals)
+        )
+    geojson = json.loads(geometries.to_json(drop_id=True))
+    return {
+        country: feature["geometry"]
+        for country, feature in zip(geometries.index, geojson["features"])
+    }
+
+
+@timed_phase("render")
+def join_geometries(attributes, geometries, decimals=None):
+    """Join attribute rows to their pre-serialized country geometry.
+
+    Returns GeoJSON features with the attributes merged in as properties, the
+    shape Vega expects for inline geoshape data. Rows whose country has no
+    geometry are dropped. ``decimals`` rounds the coordinates.
+    """
+    features = _derived_from(
+        geometries,
+        f"geojson:{decimals}",
+        functools.partial(_serialize_geometries, decimals=decimals),
+    )
+    values = json_values(attributes)
+    return [
+        {"type": "Feature", "geometry": features[row["country"]], **row}
+        for row in values.to_dict(orient="records")
+        if row["country"] in features
+    ]
+
+
+# Simplification tolerances of the map geometry tiers in degrees, coarsest
+# first. 0 is the full-resolution geometry.
+GEOMETRY_TOLERANCES = (0.25, 0.1, 0.05, 0.0)
+
+
+def simplify_geometries(geometries, tolerance):
+    """Return ``geometries`` simplified to ``tolerance`` degrees.
+
+    Each tier is built once per geometries object. Simplification preserves
+    the topology of every shape, so no polygon collapses or crosses itself,
+    but neighbouring borders are simplified independently.
+    """
+    if not tolerance:
+        return geometries
+    return _derived_from(
+        geometries,
+        f"simplified:{tolerance}",
+        lambda geometries: geometries.simplify(tolerance, preserve_topology=True),
+    )
+
+
+def coordinate_decimals(tolerance):
+    """Decimal places to round the coordinates of a geometry tier to.
+
+    The rounding error stays at least 10 times under the tier's
+    simplification ``tolerance``; full-resolution shapes keep 4 places,
+    about 10 metres.
+    """
+    if not tolerance:
+        return 4
+    return 1 + math.ceil(-math.log10(tolerance))
+
+
+# Columns summarised by the aggregate cube behind the metric cards
+CUBE_COLUMNS = ["life_exp", "hdi_index", "co2_consump", "gdp", "services", "population"]
+
+
+class AggregateCube:
+    """Sums and non-null counts of every card metric keyed by (year, continent).
+
+    Averages for any continent selection are sums over a handful of cells
+    instead of filters over the full frame, and ``kpis`` computes them for
+    many selections and years at once.
+    """
+
+    def __init__(self, df):
+        self.columns = [c for c in CUBE_COLUMNS if c in df.columns]
+        self._column_index = {c: i for i, c in enumerate(self.columns)}
+
+        years = df["year"].to_numpy(dtype="int64")
+        self.first_year = int(years.min()) if len(years) else 0
+        n_years = int(years.max()) - self.first_year + 1 if len(years) else 0
+
+        # Missing continents get their own cell so "(All)" still covers them
+        codes, continents = pd.factorize(df["continent"], use_na_sentinel=False)
+        self._continent_index = {
+            c: i for i, c in enumerate(continents) if pd.notna(c)
+        }
+        n_cells = n_years * len(continents)
+        cells = (years - self.first_year) * len(continents) + codes
+
+        values = df[self.columns].to_numpy(dtype="float64")
+        present = ~np.isnan(values)
+        shape = (n_years, len(continents), len(self.columns))
+        filled = np.where(present, values, 0.0)
+        self.sums = np.stack(
+            [
+                np.bincount(cells, weights=filled[:, i], minlength=n_cells)
+                for i in range(len(self.columns))
+            ],
+            axis=-1,
+        ).reshape(shape)
+        self.counts = np.stack(
+            [
+                np.bincount(cells, weights=present[:, i], minlength=n_cells)
+                for i in range(len(self.columns))
+            ],
+            axis=-1,
+        ).reshape(shape)
+        self.rows = np.bincount(cells, minlength=n_cells).reshape(shape[:2])
+
+    def _continents(self, selected_continent):
+        """Translate a continent selection into an index along the continent axis."""
+        if isinstance(selected_continent, str):
+            selected_continent = [selected_continent]
+        if "(All)" in selected_continent:
+            return slice(None)
+        return [
+            self._continent_index[c]
+            for c in selected_continent
+            if c in self._continent_index
+        ]
+
+    def kpis(self, selections=None, years=None):
+        """Tidy table of yearly means and year-over-year changes.
+
+        ``selections`` are continent selections, by default "(All)" and each
+        continent on its own, and ``years`` limits the years returned. Every
+        selection, year and column is computed in one pass over the cube.
+        Returns one row per (year, continent, metric), where ``continent``
+        names the selection, with the number of rows in the year, the
+        ``mean``, the ``previous`` year's mean and the percentage
+        ``change`` between them. Means without data are NaN, as are changes
+        from a missing or zero previous mean.
+        """
+        if selections is None:
+            selections = ["(All)", *self._continent_index]
+        selections = [
+            [selection] if isinstance(selection, str) else list(selection)
+            for selection in selections
+        ]
+
+        # One row of continent weights per selection
+        weights = np.zeros((len(selections), self.rows.shape[1]))
+        for i, selection in enumerate(selections):
+            weights[i, self._continents(selection)] = 1
+
+        sums = np.einsum("ycm,sc->ysm", self.sums, weights)
+        counts = np.einsum("ycm,sc->ysm", self.counts, weights)
+        rows = self.rows @ weights.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, sums / counts, np.nan)
+            previous = np.full_like(means, np.nan)
+            previous[1:] = means[:-1]
+            change = np.where(
+                previous != 0, (means - previous) / previous * 100, np.nan
+            )
+
+        all_years = np.arange(self.first_year, self.first_year + len(means))
+        if years is not None:
+            keep = np.isin(all_years, list(years))
+            all_years, rows = all_years[keep], rows[keep]
+            means, previous, change = means[keep], previous[keep], change[keep]
+
+        shape = means.shape
+        return pd.DataFrame(
+            {
+                "year": np.repeat(all_years, shape[1] * shape[2]),
+                "continent": np.tile(
+                    np.repeat([", ".join(s) for s in selections], shape[2]), shape[0]
+                ),
+                "metric": np.tile(self.columns, shape[0] * shape[1]),
+                "rows": np.repeat(rows.astype("int64").ravel(), shape[2]),
+                "mean": means.ravel(),
+                "previous": previous.ravel(),
+                "change": change.ravel(),
+            }
+        )
+
+
+# Derived structures keyed by the identity of the frame they were built from
+_derived = {}
+
+
+def _derived_from(df, name, builder):
+    """Build ``builder(df)`` once per frame object and drop it with the frame."""
+    key = (id(df), name)
+    entry = _derived.get(key)
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+
+    value = builder(df)
+    # The dict is bound here because module globals may already be cleared
+    # when frames are freed at interpreter shutdown
+    reference = weakref.ref(
+        df, lambda _, key=key, derived=_derived: derived.pop(key, None)
+    )
+    _derived[key] = (reference, value)
+    return value
+
+
+def get_kpi_table(df):
+    """Return the KPI table of ``df`` for "(All)" and each continent.
+
+    The table is built on first use and kept with the frame.
+    """
+    return _derived_from(df, "kpi_table", lambda df: get_aggregate_cube(df).kpis())
+
+
+def _continent_extents(geo_df, geometries):
+    """Westmost and eastmost longitude of each continent's shapes."""
+    continents = geo_df.drop_duplicates("country").set_index("country")["continent"]
+    bounds = geometries.bounds.join(continents, how="inner")
+    return bounds.groupby("continent", observed=True).agg(
+        west=("minx", "min"), east=("maxx", "max")
+    )
+
+
+def get_continent_extents(geo_df, geometries):
+    """Return the continent extents of ``geometries``, building them on first use."""
+    return _derived_from(
+        geometries,
+        "continent_extents",
+        lambda geometries: _continent_extents(geo_df, geometries),
+    )
+
+
+def get_aggregate_cube(df):
+    """Return the aggregate cube for ``df``, building it on first use."""
+    return _derived_from(df, "aggregate_cube", AggregateCube)
+
+
+class FrameIndex:
+    """Row offsets of every (year, continent) cell of a frame.
+
+    The frame is kept sorted by (year, continent, country), so a year or
+    year and continent selection is one slice, or a concatenation of one
+    slice per selected continent, instead of a boolean mask over every row.
+    Frames from ``enforce_schema`` are already sorted; others are sorted here.
+    """
+
+    def __init__(self, df):
+        years = df["year"].to_numpy(dtype="int64")
+        self.first_year = int(years.min()) if len(years) else 0
+        self.n_years = int(years.max()) - self.first_year + 1 if len(years) else 0
+
+        # Rows without a continent sort into a last slot of each year
+        continents = df["continent"].cat.categories
+        self._continent_index = {c: i for i, c in enumerate(continents)}
+        self._slots = len(continents) + 1
+        codes = df["continent"].cat.codes.to_numpy(dtype="int64")
+        cells = (years - self.first_year) * self._slots
+        cells += np.where(codes < 0, self._slots - 1, codes)
+
+        if np.any(np.diff(cells) < 0):
+            order = np.lexsort((df["country"].cat.codes.to_numpy(), cells))
+            self._sorted = df.iloc[order].reset_index(drop=True)
+            self._frame = lambda: self._sorted
+            cells = cells[order]
+        else:
+            # A weak reference, so the index cached with the frame in
+            # ``_derived`` does not keep the frame alive
+            self._frame = weakref.ref(df)
+
+        self.offsets = np.searchsorted(
+            cells, np.arange(self.n_years * self._slots + 1)
+        )
+
+    @property
+    def frame(self):
+        """The indexed frame, sorted by (year, continent, country)."""
+        return self._frame()
+
+    def _slice(self, first_cell, last_cell):
+        return self.frame.iloc[self.offsets[first_cell] : self.offsets[last_cell]]
+
+    @timed_phase("filter")
+    def rows(self, year, selected_continent):
+        """Rows for a year and continent selection, without scanning the frame."""
+        y = year - self.first_year
+        if not 0 <= y < self.n_years:
+            return self.frame.iloc[:0]
+
+        first_cell = y * self._slots
+        if isinstance(selected_continent, str):
+            selected_continent = [selected_continent]
+        if "(All)" in selected_continent:
+            return self._slice(first_cell, first_cell + self._slots)
+
+        slots = sorted(
+            {
+                self._continent_index[c]
+                for c in selected_continent
+                if c in self._continent_index
+            }
+        )
+        if not slots:
+            return self.frame.iloc[:0]
+        if len(slots) == 1:
+            return self._slice(first_cell + slots[0], first_cell + slots[0] + 1)
+
+        # Gather the selected continents' row ranges in one take
+        cells = first_cell + np.array(slots)
+        positions = np.concatenate(
+            [
+                np.arange(start, stop)
+                for start, stop in zip(self.offsets[cells], self.offsets[cells + 1])
+            ]
+        )
+        return self.frame.take(positions)
+
+
+def get_frame_index(df):
+    """Return the (year, continent) index for ``df``, building it on first use."""
+    return _derived_from(df, "frame_index", FrameIndex)
+
+
+@functools.lru_cache(maxsize=4)
+def _open_partitioned(path):
+    return ds.dataset(path, format="parquet", partitioning="hive")
+
+
+def query(path, years=None, continents=None, columns=None):
+    """Read rows from the partitioned dataset at ``path``, filtering in pyarrow.
+
+    ``years`` and ``continents`` are pushed down as predicates, so only the
+    matching partitions and row groups are read, and only ``columns`` are
+    decoded. ``None``, or a continent selection containing "(All)", reads
+    everything, and an empty selection reads nothing. The result goes
+    through ``enforce_schema``.
+    """
+    dataset = _open_partitioned(path)
+    predicate = None
+    if years is not None:
+        predicate = ds.field("year").isin([int(year) for year in years])
+    if continents is not None:
+        if isinstance(continents, str):
+            continents = [continents]
+        if not continents:
+            # pyarrow cannot type an empty value set, so skip the scan
+            table = dataset.schema.empty_table()
+            if columns is not None:
+                table = table.select(columns)
+            return enforce_schema(table.to_pandas())
+        if "(All)" not in continents:
+            in_continents = ds.field("continent").isin(list(continents))
+            if predicate is not None:
+                in_continents = predicate & in_continents
+            predicate = in_continents
+
+    table = dataset.to_table(columns=columns, filter=predicate)
+    return enforce_schema(table.to_pandas())
+
+
+# Every frame the callbacks read, swapped as a unit when the data is refreshed.
+# With a partitioned ``store``, ``df`` holds only the key columns.
+Dataset = namedtuple("Dataset", ["df", "geo_df", "geometries", "version", "store"])
+
+KEY_COLUMNS = ["year", "continent", "country"]
+
+
+@timed_phase("filter")
+def read_rows(data, columns, years=None, continents=None):
+    """The rows a chart needs from ``data``.
+
+    Returns the in-memory frame as is, leaving the filtering to the chart
+    builders, or reads just the selected rows and columns from the
+    partitioned store.
+    """
+    if data.store is None:
+        return data.df
+    return query(data.store, years, continents, columns)
+
+
+ARROW_ROOT = "data/processed/arrow"
+# Bumped whenever the stored columns or dtypes change, so stores written by
+# older code are rebuilt rather than mapped
+ARROW_STORE_FORMAT = 2
+
+
+def _arrow_table(df):
+    """Arrow table of ``df`` whose numeric columns map back without copying.
+
+    Categoricals become dictionary arrays. NaN is kept as a float value
+    rather than turned into a null, since nulls make ``to_pandas`` allocate.
+    """
+    arrays = []
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            categories = values.cat.categories.to_numpy(dtype=object)
+            arrays.append(
+                pa.DictionaryArray.from_arrays(
+                    pa.array(codes, mask=codes < 0), pa.array(categories)
+                )
+            )
+        else:
+            arrays.append(pa.array(values.to_numpy()))
+    return pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns])
+
+
+def write_arrow_store(version):
+    """Materialize the loaded frames as Arrow IPC files for ``version``.
+
+    The rows and the map attributes are written as uncompressed Feather
+    files, and the country shapes as WKB. Returns the store directory.
+    """
+
+    def write(path):
+        df = enforce_schema(pd.read_parquet(PARQUET_PATH))
+        attributes, geometries = _split_geodata()
+        options = {"compression": "uncompressed"}
+        feather.write_feather(_arrow_table(df), f"{path}/data.arrow", **options)
+        feather.write_feather(
+            _arrow_table(attributes), f"{path}/attributes.arrow", **options
+        )
+        shapes = pa.table(
+            {
+                "country": geometries.index.to_numpy(dtype=object),
+                "geometry": geometries.to_wkb().to_numpy(),
+            }
+        ).replace_schema_metadata({"crs": geometries.crs.to_json()})
+        feather.write_feather(shapes, f"{path}/geometries.arrow", **options)
+
+    name = f"{version.replace(':', '-')}-f{ARROW_STORE_FORMAT}"
+    return publish_versioned(ARROW_ROOT, name, write)
+
+
+def map_arrow_store(path):
+    """Memory-map the frames written by ``write_arrow_store``.
+
+    Numeric columns are read-only views of the mapped files, so every worker
+    mapping the same store shares one copy in the page cache.
+    """
+    import geopandas as gpd
+
+    df = feather.read_table(f"{path}/data.arrow", memory_map=True)
+    attributes = feather.read_table(f"{path}/attributes.arrow", memory_map=True)
+    shapes = feather.read_table(f"{path}/geometries.arrow", memory_map=True)
+    geometries = gpd.GeoSeries.from_wkb(
+        shapes["geometry"].to_numpy(),
+        index=pd.Index(shapes["country"].to_numpy(), name="country"),
+        crs=shapes.schema.metadata[b"crs"].decode(),
+        name="geometry",
+    )
+    return (
+        df.to_pandas(split_blocks=True),
+        attributes.to_pandas(split_blocks=True),
+        geometries,
+    )
+
+
+def load_dataset():
+    """Refresh and load every frame, building their indexes before they are served."""
+    if os.path.exists(RAW_CSV_PATH):
+        refresh(RAW_CSV_PATH, PARQUET_PATH)
+    version = f"{file_version(PARQUET_PATH)}:{file_version(GEODATA_PATH)}"
+
+    store = None
+    if DATA_SOURCE == "mmap":
+        df, geo_df, geometries = map_arrow_store(write_arrow_store(version))
+    else:
+        geo_df, geometries = load_geodata()
+        if DATA_SOURCE == "partitioned":
+            store = write_partitioned(PARQUET_PATH, partition_by=PARTITION_BY)
+            df = query(store, columns=KEY_COLUMNS)
+        else:
+            df = load_data()
+
+    if store is None:
+        get_frame_index(df)
+    get_frame_index(geo_df)
+    get_aggregate_cube(geo_df)
+    return Dataset(df, geo_df, geometries, version, store)
+
+
+def _files_signature():
+    """Size and modification time of every input file, to notice changes cheaply."""
+    signature = []
+    for path in (RAW_CSV_PATH, PARQUET_PATH, GEODATA_PATH):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            signature.append(None)
+    return signature
+
+
+class DataStore:
+    """Holds the current ``Dataset`` and hot-swaps it when the data files change.
+
+    ``current()`` returns the dataset to serve a request from. At most every
+    ``interval`` seconds it also checks the raw CSV, the Parquet file and the
+    GeoJSON for a new size or modification time. On a change a background
+    thread calls ``load`` to refresh and reload the data. If the reloaded
+    version differs, the new dataset replaces the old one in one assignment and
+    every ``on_swap`` listener is called with it. Requests in flight keep the
+    dataset they started with. An ``interval`` of 0 disables the checks.
+
+    With ``lazy`` nothing is loaded until the first ``current()`` call.
+    """
+
+    def __init__(self, load, interval=0, lazy=False):
+        self._load = load
+        self.interval = interval
+        self.dataset = None if lazy else load()
+        self._signature = _files_signature()
+        self._next_check = time.monotonic() + interval
+        self._loading = threading.Lock()
+        self._reloading = threading.Lock()
+        self._listeners = []
+        self.swaps = 0
+
+    def on_swap(self, listener):
+        """Call ``listener(dataset)`` after every swap."""
+        self._listeners.append(listener)
+
+    def current(self):
+        """The dataset to serve from, starting a reload if the files changed."""
+        if self.dataset is None:
+            with self._loading:
+                if self.dataset is None:
+                    self.dataset = self._load()
+                    self._signature = _files_signature()
+            return self.dataset
+
+        now = time.monotonic()
+        if self.interval > 0 and now >= self._next_check:
+            self._next_check = now + self.interval
+            if _files_signature() != self._signature:
+                self.reload(wait=False)
+        return self.dataset
+
+    def reload(self, wait=True):
+        """Reload the data and swap it in if its version changed.
+
+        Returns False if another reload is already running.
+        """
+        if not self._reloading.acquire(blocking=False):
+            return False
+        if wait:
+            self._reload()
+        else:
+            threading.Thread(target=self._reload, daemon=True).start()
+        return True
 
-    return geo_df
+    def _reload(self):
+        try:
+            dataset = self._load()
+            self._signature = _files_signature()
+            if self.dataset is None or dataset.version != self.dataset.version:
+                self.dataset = dataset
+                self.swaps += 1
+                for listener in self._listeners:
+                    listener(dataset)
+        except Exception:
+            logger.exception("Reloading the data failed; still serving the old data")
+        finally:
+            self._reloading.release()
@@ -0,0 +1,405 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.config import DATA_SOURCE, INGEST_CHUNK_ROWS, PARTITION_BY
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RAW_CSV_PATH = "data/raw/gapminder_data_graphs.csv"
+PARQUET_PATH = "data/processed/gapminder_data.parquet"
+PARTITIONED_ROOT = "data/processed/gapminder_partitioned"
+
+# Columns kept from the raw CSV and the Parquet types they are written as.
+# Rows missing any of them are dropped.
+RAW_SCHEMA = pa.schema(
+    [
+        ("country", pa.string()),
+        ("continent", pa.string()),
+        ("year", pa.int16()),
+        ("life_exp", pa.float32()),
+        ("hdi_index", pa.float32()),
+        ("co2_consump", pa.float32()),
+        ("gdp", pa.float32()),
+        ("services", pa.float32()),
+    ]
+)
+
+YEAR_RANGE = (np.iinfo(np.int16).min, np.iinfo(np.int16).max)
+
+# Parquet metadata key holding the fingerprint of the CSV a file was built from
+SOURCE_KEY = b"longevity_visualizer.source"
+
+
+def _peak_rss_mb():
+    """Peak resident memory of this process in megabytes, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def clean_chunk(chunk):
+    """Validate and coerce one chunk of raw rows to ``RAW_SCHEMA``.
+
+    Unparseable numbers count as missing, and rows with a missing value or a
+    year that is not a whole number in the int16 range are dropped.
+    """
+    chunk = chunk[RAW_SCHEMA.names].copy()
+    for field in RAW_SCHEMA:
+        if pa.types.is_string(field.type):
+            chunk[field.name] = chunk[field.name].str.strip().replace("", np.nan)
+        else:
+            chunk[field.name] = pd.to_numeric(chunk[field.name], errors="coerce")
+    chunk = chunk.dropna()
+
+    year = chunk["year"]
+    valid = (year % 1 == 0) & year.between(*YEAR_RANGE)
+    chunk = chunk[valid]
+    return pa.Table.from_pandas(chunk, schema=RAW_SCHEMA, preserve_index=False)
+
+
+def _file_stat(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _hash_file(path, prefix_bytes=0, block_size=2**20):
+    """SHA-1 of the first ``prefix_bytes`` of ``path`` and of the whole file.
+
+    Both digests come from a single read of the file.
+    """
+    digest = hashlib.sha1()
+    prefix_digest = None
+    read = 0
+    with open(path, "rb") as f:
+        while True:
+            if prefix_digest is None and read == prefix_bytes:
+                prefix_digest = digest.hexdigest()
+            want = block_size
+            if prefix_digest is None:
+                want = min(block_size, prefix_bytes - read)
+            block = f.read(want)
+            if not block:
+                break
+            digest.update(block)
+            read += len(block)
+    return prefix_digest, digest.hexdigest()
+
+
+def source_fingerprint(parquet_path):
+    """The raw CSV fingerprint recorded in ``parquet_path``, or None.
+
+    A dict with the ``sha1``, ``bytes`` and ``mtime_ns`` of the CSV the file
+    was ingested from.
+    """
+    try:
+        metadata = pq.read_schema(parquet_path).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if SOURCE_KEY not in metadata:
+        return None
+    return json.loads(metadata[SOURCE_KEY])
+
+
+def file_version(path):
+    """Short fingerprint of a processed file.
+
+    The Parquet file is identified by the hash of the CSV it was ingested
+    from, so rewriting it with the same content keeps its version; other
+    files by their size and modification time.
+    """
+    source = source_fingerprint(path)
+    if source is not None:
+        return source["sha1"][:12]
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def _read_chunks(csv_path, chunk_rows, offset=0):
+    """Read ``csv_path`` in chunks, starting from byte ``offset`` of the file.
+
+    ``offset`` must fall on a line boundary; the header is always taken from
+    the first line.
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    missing = [name for name in RAW_SCHEMA.names if name not in header]
+    if missing:
+        raise ValueError(f"{csv_path} is missing columns: {', '.join(missing)}")
+
+    with open(csv_path, "rb") as f:
+        options = {}
+        if offset:
+            f.seek(offset)
+            options = {"header": None, "names": list(header)}
+        yield from pd.read_csv(
+            f,
+            usecols=RAW_SCHEMA.names,
+            dtype={"country": str, "continent": str},
+            chunksize=chunk_rows,
+            **options,
+        )
+
+
+def _write_parquet(parquet_path, fingerprint, chunks, keep_from=None):
+    """Write cleaned ``chunks`` to ``parquet_path``, replacing it atomically.
+
+    Row groups of ``keep_from`` are copied over first without re-parsing the
+    CSV they came from. ``fingerprint`` is recorded in the file metadata.
+    Returns the rows read and written and the row groups written.
+    """
+    schema = RAW_SCHEMA.with_metadata(
+        {SOURCE_KEY: json.dumps(fingerprint, sort_keys=True)}
+    )
+    rows_read = rows_written = row_groups = 0
+    os.makedirs(os.path.dirname(parquet_path) or ".", exist_ok=True)
+    partial_path = f"{parquet_path}.partial"
+    try:
+        with pq.ParquetWriter(partial_path, schema) as writer:
+            if keep_from is not None:
+                for i in range(keep_from.num_row_groups):
+                    writer.write_table(
+                        keep_from.read_row_group(i).replace_schema_metadata(
+                            schema.metadata
+                        )
+                    )
+            for chunk in chunks:
+                rows_read += len(chunk)
+                table = clean_chunk(chunk)
+                if table.num_rows:
+                    writer.write_table(table)
+                    rows_written += table.num_rows
+                    row_groups += 1
+        os.replace(partial_path, parquet_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return rows_read, rows_written, row_groups
+
+
+def _summary(mode, start, rows_read=0, rows_written=0, row_groups=0):
+    seconds = time.perf_counter() - start
+    peak_rss_mb = _peak_rss_mb()
+    return {
+        "mode": mode,
+        "rows_read": rows_read,
+        "rows_written": rows_written,
+        "rows_dropped": rows_read - rows_written,
+        "row_groups": row_groups,
+        "seconds": round(seconds, 2),
+        "rows_per_second": round(rows_read / seconds) if seconds else None,
+        "peak_rss_mb": None if peak_rss_mb is None else round(peak_rss_mb, 1),
+    }
+
+
+def ingest_csv(csv_path=RAW_CSV_PATH, parquet_path=PARQUET_PATH, chunk_rows=None):
+    """Stream ``csv_path`` into ``parquet_path`` one chunk at a time.
+
+    Each chunk is cleaned by ``clean_chunk`` and written as its own row
+    group, so memory stays bounded by the chunk size rather than the file
+    size. The Parquet file is written under a temporary name and moved into
+    place once complete. Returns a summary of the run.
+    """
+    start = time.perf_counter()
+    size, mtime_ns = _file_stat(csv_path)
+    _, sha1 = _hash_file(csv_path)
+    fingerprint = {"sha1": sha1, "bytes": size, "mtime_ns": mtime_ns}
+    chunks = _read_chunks(csv_path, chunk_rows or INGEST_CHUNK_ROWS)
+    return _summary(
+        "rebuild", start, *_write_parquet(parquet_path, fingerprint, chunks)
+    )
+
+
+@contextlib.contextmanager
+def _refresh_lock(parquet_path):
+    """Hold an exclusive lock on ``parquet_path`` across processes, where supported."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(parquet_path) or ".", exist_ok=True)
+    with open(f"{parquet_path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _pending_change(csv_path, parquet_path):
+    """What ``refresh`` has to do to bring ``parquet_path`` up to date.
+
+    None when the recorded fingerprint matches ``csv_path``, otherwise the
+    new fingerprint and the byte offset to append from, 0 for a rebuild.
+    Only reads the files.
+    """
+    recorded = source_fingerprint(parquet_path)
+    size, mtime_ns = _file_stat(csv_path)
+    if recorded and (recorded["bytes"], recorded["mtime_ns"]) == (size, mtime_ns):
+        return None
+
+    prefix_bytes = recorded["bytes"] if recorded and recorded["bytes"] < size else 0
+    prefix_sha1, sha1 = _hash_file(csv_path, prefix_bytes)
+    if recorded and recorded["sha1"] == sha1:
+        # Same content with a new timestamp, e.g. after a fresh checkout
+        return None
+
+    fingerprint = {"sha1": sha1, "bytes": size, "mtime_ns": mtime_ns}
+    if prefix_bytes and prefix_sha1 == recorded["sha1"]:
+        with open(csv_path, "rb") as f:
+            f.seek(prefix_bytes - 1)
+            if f.read(1) == b"\n":
+                return fingerprint, prefix_bytes
+    return fingerprint, 0
+
+
+def refresh(csv_path=RAW_CSV_PATH, parquet_path=PARQUET_PATH, chunk_rows=None):
+    """Bring ``parquet_path`` up to date with ``csv_path``, doing as little as possible.
+
+    The Parquet file records the size, modification time and SHA-1 of the
+    CSV it was built from. If the CSV's content is unchanged nothing is
+    done; a matching size and modification time skip hashing it. If the old
+    CSV is a prefix of the new one, for example when new years are appended,
+    only the appended rows are ingested and the existing row groups are
+    copied as they are. Anything else is a full rebuild. Nothing is written
+    while the file is up to date, so a read-only ``data/processed`` works;
+    otherwise concurrent refreshes from several workers are serialized with
+    a lock file.
+    """
+    start = time.perf_counter()
+    chunk_rows = chunk_rows or INGEST_CHUNK_ROWS
+    if _pending_change(csv_path, parquet_path) is None:
+        return _summary("unchanged", start)
+
+    with _refresh_lock(parquet_path):
+        # Another worker may have refreshed the file while this one waited
+        change = _pending_change(csv_path, parquet_path)
+        if change is None:
+            return _summary("unchanged", start)
+
+        fingerprint, append_from = change
+        if append_from:
+            with pq.ParquetFile(parquet_path) as existing:
+                chunks = _read_chunks(csv_path, chunk_rows, offset=append_from)
+                counts = _write_parquet(
+                    parquet_path, fingerprint, chunks, keep_from=existing
+                )
+            return _summary("append", start, *counts)
+
+        chunks = _read_chunks(csv_path, chunk_rows)
+        return _summary(
+            "rebuild", start, *_write_parquet(parquet_path, fingerprint, chunks)
+        )
+
+
+def publish_versioned(root, name, write, lock_path=PARQUET_PATH):
+    """Create the directory ``root/name`` with ``write(path)`` unless it exists.
+
+    The directory is written under a temporary name and renamed into place,
+    so readers never see a partial one. The most recent other directory
+    under ``root`` is kept for workers that have not swapped yet, and older
+    ones are removed. Returns the directory.
+    """
+    path = os.path.join(root, name)
+    with _refresh_lock(lock_path):
+        if os.path.isdir(path):
+            return path
+
+        partial_path = f"{path}.partial"
+        shutil.rmtree(partial_path, ignore_errors=True)
+        os.makedirs(partial_path)
+        write(partial_path)
+        os.replace(partial_path, path)
+
+        others = sorted(
+            (entry for entry in os.scandir(root) if entry.path != path),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in others[:-1]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+    return path
+
+
+def write_partitioned(
+    parquet_path=PARQUET_PATH, root=PARTITIONED_ROOT, partition_by=("year",)
+):
+    """Write ``parquet_path`` as a Hive-partitioned dataset under ``root``.
+
+    Each version of the Parquet file and choice of ``partition_by`` columns
+    gets its own directory from ``publish_versioned``. Returns the dataset
+    directory.
+    """
+
+    def write(path):
+        ds.write_dataset(
+            ds.dataset(parquet_path, format="parquet"),
+            path,
+            format="parquet",
+            partitioning=list(partition_by),
+            partitioning_flavor="hive",
+            max_rows_per_group=INGEST_CHUNK_ROWS,
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+    name = "-".join([file_version(parquet_path), *partition_by])
+    return publish_versioned(root, name, write, parquet_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a raw Gapminder CSV into the Parquet file the app loads."
+    )
+    parser.add_argument("--csv", default=RAW_CSV_PATH, help="Raw CSV to read.")
+    parser.add_argument(
+        "--parquet", default=PARQUET_PATH, help="Parquet file to write."
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=None,
+        help=f"Rows per chunk and row group (default: {INGEST_CHUNK_ROWS}).",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Rebuild from scratch even if the Parquet file is up to date.",
+    )
+    parser.add_argument(
+        "--partition-by",
+        default=",".join(PARTITION_BY) if DATA_SOURCE == "partitioned" else None,
+        help="Also write a Hive-partitioned dataset by these comma-separated "
+        "columns, e.g. year,continent (default: only with "
+        "LV_DATA_SOURCE=partitioned).",
+    )
+    args = parser.parse_args()
+
+    ingest = ingest_csv if args.full else refresh
+    summary = ingest(args.csv, args.parquet, args.chunk_rows)
+    if args.partition_by:
+        summary["partitioned"] = write_partitioned(
+            args.parquet, partition_by=tuple(args.partition_by.split(","))
+        )
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import sys
+
+import flask
+
+from src.data import get_aggregate_cube, get_kpi_table
+
+
+def kpi_table(data, selections=None, years=None):
+    """KPI table of the ``Dataset`` ``data``.
+
+    Without ``selections`` the table covers "(All)" and each continent and
+    comes from the table kept with the frame; otherwise it is computed for
+    the given continent selections. ``years`` limits the years returned.
+    """
+    if selections:
+        return get_aggregate_cube(data.geo_df).kpis(selections, years)
+    table = get_kpi_table(data.geo_df)
+    if years:
+        table = table[table["year"].isin(years)].reset_index(drop=True)
+    return table
+
+
+def _selections(values):
+    """Continent selections from ``continent`` arguments like "Asia,Europe"."""
+    return [value.split(",") for value in values]
+
+
+def register_kpi_route(server, get_data, route="/kpis"):
+    """Serve the KPI table of ``get_data()`` from ``route`` on ``server``.
+
+    ``year`` and ``continent`` query parameters may be repeated; each
+    ``continent`` is one selection, with continents joined by commas.
+    ``format=csv`` returns CSV instead of JSON records.
+    """
+
+    def kpis():
+        args = flask.request.args
+        table = kpi_table(
+            get_data(),
+            _selections(args.getlist("continent")),
+            args.getlist("year", type=int),
+        )
+        if args.get("format") == "csv":
+            return flask.Response(table.to_csv(index=False), mimetype="text/csv")
+        return flask.Response(
+            table.to_json(orient="records"), mimetype="application/json"
+        )
+
+    server.add_url_rule(route, "kpis", kpis)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export yearly averages and year-over-year changes as CSV."
+    )
+    parser.add_argument(
+        "--out", default="-", help="File to write (default: standard output)."
+    )
+    parser.add_argument(
+        "--year", type=int, action="append", help="Year to export; repeatable."
+    )
+    parser.add_argument(
+        "--continent",
+        action="append",
+        default=[],
+        help='Continent selection such as "Asia,Europe"; repeatable '
+        '(default: "(All)" and each continent).',
+    )
+    args = parser.parse_args()
+
+    from src.app import server
+    from src.data import load_dataset
+
+    with server.app_context():
+        table = kpi_table(load_dataset(), _selections(args.continent), args.year)
+    table.to_csv(sys.stdout if args.out == "-" else args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
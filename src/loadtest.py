@@ -0,0 +1,395 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import numpy as np
+import requests
+
+from src.payloads import SAMPLE_INPUTS, update_request
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+# Relative frequency of each kind of interaction in a session
+ACTION_WEIGHTS = {"scrub": 4, "continent": 2, "click": 2, "metric": 1}
+
+
+def _outputs(output):
+    """Wire form of a callback output id from ``_dash-dependencies``."""
+    if not output.startswith(".."):
+        id, prop = output.rsplit(".", 1)
+        return {"id": id, "property": prop}
+    return [_outputs(part) for part in output[2:-2].split("...")]
+
+
+def _props(layout, found=None):
+    """Props of every component in a ``_dash-layout`` tree, keyed by id."""
+    found = {} if found is None else found
+    if isinstance(layout, list):
+        for child in layout:
+            _props(child, found)
+    elif isinstance(layout, dict) and "props" in layout:
+        props = layout["props"]
+        if "id" in props:
+            found[props["id"]] = props
+        _props(props.get("children"), found)
+    return found
+
+
+def _option_values(options):
+    return [o["value"] if isinstance(o, dict) else o for o in options or []]
+
+
+class Dashboard:
+    """Callbacks and control values of a running app, read from its routes."""
+
+    def __init__(self, url, session):
+        self.url = url.rstrip("/") + "/"
+        dependencies = session.get(self.url + "_dash-dependencies").json()
+        layout = _props(session.get(self.url + "_dash-layout").json())
+
+        self.callbacks = [
+            {
+                "output": dep["output"],
+                "outputs": _outputs(dep["output"]),
+                "inputs": dep["inputs"],
+                "triggers": {(i["id"], i["property"]) for i in dep["inputs"]},
+            }
+            for dep in dependencies
+            if not dep.get("clientside_function")
+        ]
+        # Props left at their component defaults are not in the layout
+        self.initial = {
+            key: layout.get(key[0], {}).get(key[1], SAMPLE_INPUTS.get(key))
+            for callback in self.callbacks
+            for key in callback["triggers"]
+        }
+
+        slider = layout.get("year-slider-top")
+        self.years = (
+            list(range(slider["min"], slider["max"] + 1, slider.get("step") or 1))
+            if slider
+            else []
+        )
+        continents = layout.get("continent-dropdown", {}).get("options")
+        self.continents = [c for c in _option_values(continents) if c != "(All)"]
+        metrics = layout.get("metric-dropdown-bottom", {}).get("options")
+        self.metrics = _option_values(metrics)
+
+
+class Results:
+    """Latency and errors of every request, by callback output."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, output, seconds, ok):
+        with self._lock:
+            self.latencies[output].append(seconds)
+            if not ok:
+                self.errors[output] += 1
+
+    def report(self, elapsed):
+        """Throughput, latency percentiles in ms and error rate per callback."""
+        rows = {}
+        everything = []
+        for output, latencies in sorted(self.latencies.items()):
+            everything.extend(latencies)
+            rows[output] = _stats(latencies, self.errors[output], elapsed)
+        rows["(all)"] = _stats(everything, sum(self.errors.values()), elapsed)
+        return rows
+
+
+def _stats(latencies, errors, elapsed):
+    p50, p95, p99 = np.percentile(latencies or [0], [50, 95, 99]) * 1000
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "error_rate": errors / len(latencies) if latencies else 0.0,
+    }
+
+
+class UserSession:
+    """One simulated user clicking through the dashboard.
+
+    Every change of a control runs the callbacks it is an input of, then the
+    callbacks whose inputs those changed, as the Dash renderer does. Requests
+    go one at a time.
+    """
+
+    def __init__(self, dashboard, results, rng, think=0.0, timeout=60):
+        self.dashboard = dashboard
+        self.results = results
+        self.rng = rng
+        self.think = think
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.values = dict(dashboard.initial)
+        self.url = dashboard.url + "_dash-update-component"
+
+    def call(self, callback, changed):
+        """Run one callback and return the (id, property) pairs it changed."""
+        body = update_request(
+            callback["output"],
+            callback["outputs"],
+            callback["inputs"],
+            self.values,
+            sorted(changed & callback["triggers"]),
+        )
+        start = time.perf_counter()
+        try:
+            response = self.http.post(self.url, json=body, timeout=self.timeout)
+            ok = response.status_code in (200, 204)
+            payload = response.json() if response.status_code == 200 else {}
+        except (requests.RequestException, ValueError):
+            ok, payload = False, {}
+        self.results.record(callback["output"], time.perf_counter() - start, ok)
+
+        updated = set()
+        for id, props in payload.get("response", {}).items():
+            for prop, value in props.items():
+                if (id, prop) not in self.values or self.values[(id, prop)] != value:
+                    updated.add((id, prop))
+                self.values[(id, prop)] = value
+        return updated
+
+    def set(self, changes):
+        """Change control values and run every callback that depends on them."""
+        changed = set()
+        for key, value in changes.items():
+            self.values[key] = value
+            changed.add(key)
+        self.fire(changed)
+        if self.think:
+            time.sleep(self.think)
+
+    def fire(self, changed):
+        """Run the callbacks triggered by ``changed`` and those they trigger."""
+        done = set()
+        while changed:
+            due = [
+                callback
+                for callback in self.dashboard.callbacks
+                if callback["output"] not in done and changed & callback["triggers"]
+            ]
+            changed_next = set()
+            for callback in due:
+                done.add(callback["output"])
+                changed_next |= self.call(callback, changed)
+            changed = changed_next
+
+    def load(self):
+        """Run every callback, as on page load."""
+        self.fire(set(self.values))
+
+    def scrub(self):
+        """Drag the year slider a few steps in one direction."""
+        years = self.dashboard.years
+        if not years:
+            return
+        current = self.values.get(("year-slider-top", "value"), years[0])
+        index = years.index(current) if current in years else 0
+        step = self.rng.choice((-1, 1))
+        for _ in range(self.rng.randint(2, 8)):
+            index = min(max(index + step, 0), len(years) - 1)
+            self.set({("year-slider-top", "value"): years[index]})
+
+    def toggle_continent(self):
+        """Add or remove a continent, or go back to all of them."""
+        key = ("continent-dropdown", "value")
+        selected = self.values.get(key) or ["(All)"]
+        selected = [selected] if isinstance(selected, str) else list(selected)
+        continent = self.rng.choice(self.dashboard.continents)
+        if self.rng.random() < 0.2:
+            selected = ["(All)"]
+        elif continent in selected:
+            selected = [c for c in selected if c != continent] or ["(All)"]
+        else:
+            selected = [c for c in selected if c != "(All)"] + [continent]
+        self.set({key: selected})
+
+    def click_map(self):
+        """Click a country on the map, or click away to clear the selection."""
+        countries = [
+            c
+            for c in _option_values(self.values.get(("country-dropdown", "options")))
+            if c != "(All)"
+        ]
+        if not countries or self.rng.random() < 0.25:
+            signal = {}
+        else:
+            signal = {"select_region": {"country": [self.rng.choice(countries)]}}
+        self.set({("map-graph", "signalData"): signal})
+
+    def switch_metric(self):
+        """Pick another metric."""
+        metric = self.rng.choice(self.dashboard.metrics)
+        self.set({("metric-dropdown-bottom", "value"): metric})
+
+    def run(self, actions, deadline):
+        """Load the page and perform up to ``actions`` random interactions.
+
+        Stops early once ``time.monotonic()`` passes ``deadline``.
+        """
+        self.load()
+        handlers = {
+            "scrub": self.scrub,
+            "continent": self.toggle_continent,
+            "click": self.click_map,
+            "metric": self.switch_metric,
+        }
+        kinds = list(ACTION_WEIGHTS)
+        weights = [ACTION_WEIGHTS[kind] for kind in kinds]
+        for kind in self.rng.choices(kinds, weights, k=actions):
+            if time.monotonic() >= deadline:
+                return
+            handlers[kind]()
+
+
+def run_load(url, users=4, duration=30, actions=20, think=0.0, seed=0):
+    """Replay sessions from ``users`` concurrent users for ``duration`` seconds.
+
+    Each user starts a new session, with a page load, after every ``actions``
+    interactions. Returns the report of ``Results.report``.
+    """
+    dashboard = Dashboard(url, requests.Session())
+    results = Results()
+    deadline = time.monotonic() + duration
+
+    def user(number):
+        rng = random.Random(seed * 1000 + number)
+        while time.monotonic() < deadline:
+            UserSession(dashboard, results, rng, think).run(actions, deadline)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results.report(time.perf_counter() - start)
+
+
+def check_local(url):
+    """Raise ValueError unless ``url`` points at this machine."""
+    host = urlsplit(url).hostname
+    if host not in LOCAL_HOSTS:
+        raise ValueError(f"{url} is not a local address; load tests only run locally")
+
+
+def serve(port, workers, timeout=120):
+    """Start gunicorn with the app on ``port`` and wait until it answers."""
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "-c",
+            "gunicorn.conf.py",
+            "--bind",
+            f"127.0.0.1:{port}",
+            "--workers",
+            str(workers),
+            "src.app:server",
+        ],
+        env=os.environ.copy(),
+    )
+    url = f"http://127.0.0.1:{port}/"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+        try:
+            if requests.get(url + "_dash-layout", timeout=5).ok:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"gunicorn did not answer on {url} within {timeout} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay simulated dashboard sessions against a local server and "
+        "report throughput, latency and errors per callback."
+    )
+    parser.add_argument(
+        "--url",
+        default="http://127.0.0.1:8050/",
+        help="Address of a running app (default: http://127.0.0.1:8050/).",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Start the app under gunicorn on the port of --url and stop it after.",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Gunicorn workers with --serve."
+    )
+    parser.add_argument(
+        "--users", type=int, default=4, help="Concurrent users (default: 4)."
+    )
+    parser.add_argument(
+        "--duration", type=float, default=30, help="Seconds to run (default: 30)."
+    )
+    parser.add_argument(
+        "--actions",
+        type=int,
+        default=20,
+        help="Interactions per session before reloading the page (default: 20).",
+    )
+    parser.add_argument(
+        "--think",
+        type=float,
+        default=0.0,
+        help="Seconds each user waits between interactions (default: 0).",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    parser.add_argument("--out", help="File to also write the report to as JSON.")
+    args = parser.parse_args()
+
+    try:
+        check_local(args.url)
+    except ValueError as e:
+        parser.error(str(e))
+
+    process = serve(urlsplit(args.url).port or 80, args.workers) if args.serve else None
+    try:
+        report = run_load(
+            args.url, args.users, args.duration, args.actions, args.think, args.seed
+        )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    print(
+        f"{'callback':<50}{'requests':>9}{'req/s':>8}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+    )
+    for output, row in report.items():
+        print(
+            f"{output[:50]:<50}{row['requests']:>9}{row['rps']:>8.1f}"
+            f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+            f"{row['error_rate']:>8.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import bisect
+import contextlib
+import functools
+import threading
+import time
+from collections import defaultdict
+
+import flask
+
+# Histogram bucket upper bounds for durations in seconds and sizes in bytes
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+BYTES_BUCKETS = (1e3, 3e3, 1e4, 3e4, 1e5, 3e5, 1e6, 3e6, 1e7)
+
+
+def _labels(names, values):
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+class Histogram:
+    """Prometheus histogram with one series per label combination."""
+
+    def __init__(self, name, documentation, labelnames, buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per series: the count of each bucket, then the sum and the count
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def expose(self):
+        """Lines of the Prometheus text format for every series."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        names = self.labelnames + ("le",)
+        for key, values in series:
+            *counts, total, count = values
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                labels = _labels(names, key + (f"{bound:g}",))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(names, key + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {float(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Counter:
+    """Prometheus counter with one value per label combination."""
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def inc(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] += 1
+
+    def expose(self):
+        """Lines of the Prometheus text format for every value."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+callback_seconds = Histogram(
+    "lv_callback_seconds",
+    "Time spent per callback call, by phase. filter selects rows, altair "
+    "builds and compiles a chart template on first use, render fills templates "
+    "with data, other is the rest of the callback, serialize is Dash encoding "
+    "the response, and request is the whole request.",
+    ("callback", "phase"),
+)
+response_bytes = Histogram(
+    "lv_callback_response_bytes",
+    "Size of each callback response before compression.",
+    ("callback",),
+    BYTES_BUCKETS,
+)
+spec_cache_lookups = Counter(
+    "lv_spec_cache_lookups_total",
+    "Rendered spec lookups by result: hit, shared_hit or miss.",
+    ("callback", "result"),
+)
+
+# Phase timings of the callback running on this thread, if any
+_local = threading.local()
+_merge_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Add the time of the enclosed block to phase ``name`` of the callback."""
+    timings = getattr(_local, "phases", None)
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] += time.perf_counter() - start
+
+
+def timed_phase(name):
+    """Decorator timing every call of a function as phase ``name``."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def carry_phases(func):
+    """Wrap ``func`` to record its phases for this thread's callback on any thread.
+
+    Each call times into its own counters and adds them to the callback's
+    once done, so calls running side by side never update them at once.
+    """
+    callback = getattr(_local, "callback", None)
+    timings = getattr(_local, "phases", None)
+    if timings is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        outer = getattr(_local, "callback", None), getattr(_local, "phases", None)
+        _local.callback = callback
+        _local.phases = own = defaultdict(float)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.callback, _local.phases = outer
+            with _merge_lock:
+                for name, seconds in own.items():
+                    timings[name] += seconds
+
+    return wrapper
+
+
+def note_cache(result):
+    """Count a spec cache lookup for the callback running on this thread."""
+    callback = getattr(_local, "callback", None)
+    if callback is not None:
+        spec_cache_lookups.inc(callback=callback, result=result)
+
+
+def timed_callback(func):
+    """Wrap a Dash callback to record its phases under its function name."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _local.callback = func.__name__
+        _local.phases = timings = defaultdict(float)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            _local.phases = _local.callback = None
+            _local.finished = (func.__name__, elapsed)
+            for name, seconds in timings.items():
+                callback_seconds.observe(seconds, callback=func.__name__, phase=name)
+            callback_seconds.observe(
+                max(elapsed - sum(timings.values()), 0.0),
+                callback=func.__name__,
+                phase="other",
+            )
+
+    return wrapper
+
+
+def instrument_callbacks(app):
+    """Time every callback registered on ``app`` from now on."""
+    register = app.callback
+
+    def callback(*args, **kwargs):
+        decorator = register(*args, **kwargs)
+        return lambda func: decorator(timed_callback(func))
+
+    app.callback = callback
+
+
+def register_metrics_route(server, dispatch_path, route="/metrics"):
+    """Serve the metrics from ``route`` and time requests to ``dispatch_path``.
+
+    The request hooks see responses before any compression registered
+    earlier, so sizes are of the uncompressed JSON.
+    """
+
+    @server.before_request
+    def start_request():
+        if flask.request.path == dispatch_path:
+            _local.request_start = time.perf_counter()
+            _local.finished = None
+
+    @server.after_request
+    def finish_request(response):
+        start = getattr(_local, "request_start", None)
+        if flask.request.path != dispatch_path or start is None:
+            return response
+        _local.request_start = None
+        if _local.finished is None:
+            return response
+
+        callback, callback_elapsed = _local.finished
+        elapsed = time.perf_counter() - start
+        callback_seconds.observe(elapsed, callback=callback, phase="request")
+        callback_seconds.observe(
+            max(elapsed - callback_elapsed, 0.0), callback=callback, phase="serialize"
+        )
+        response_bytes.observe(len(response.get_data()), callback=callback)
+        return response
+
+    def metrics():
+        lines = []
+        for metric in (callback_seconds, response_bytes, spec_cache_lookups):
+            lines.extend(metric.expose())
+        return flask.Response(
+            "\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4"
+        )
+
+    server.add_url_rule(route, "metrics", metrics)
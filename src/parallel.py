@@ -0,0 +1,43 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from src.config import RENDER_THREADS
+from src.metrics import carry_phases
+
+# The render pool of this process, made on first use so that gunicorn
+# workers forked from a preloaded master each start their own threads
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def render_pool():
+    """The thread pool of this process for rendering independent outputs."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(RENDER_THREADS, thread_name_prefix="render")
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def run_all(*calls):
+    """Call every function in ``calls`` and return their results in order.
+
+    With ``RENDER_THREADS`` above 1 all but the first run on the render pool
+    while the first runs on the calling thread, so the total is close to the
+    slowest call rather than the sum. Work that holds the GIL, such as
+    building records in Python, still runs one at a time. Exceptions are
+    raised once every call has finished.
+    """
+    if RENDER_THREADS <= 1 or len(calls) <= 1:
+        return [call() for call in calls]
+
+    calls = [carry_phases(call) for call in calls]
+    futures = [render_pool().submit(call) for call in calls[1:]]
+    try:
+        first = calls[0]()
+    finally:
+        wait(futures)
+    return [first, *(future.result() for future in futures)]
@@ -0,0 +1,107 @@
+import argparse
+
+from src.compression import brotli
+
+# Input values used to call each callback, keyed by (component id, property)
+SAMPLE_INPUTS = {
+    ("continent-dropdown", "value"): ["(All)"],
+    ("year-slider-top", "value"): 2010,
+    ("metric-dropdown-bottom", "value"): "gdp",
+    ("country-dropdown", "value"): ["(All)"],
+    ("map-graph", "signalData"): {},
+    ("map-width", "data"): None,
+}
+
+
+def _wire(output):
+    """The request form of one ``Output`` or a list of them."""
+    if isinstance(output, list):
+        return [_wire(o) for o in output]
+    return {"id": output.component_id, "property": output.component_property}
+
+
+def update_request(output, outputs, inputs, values, changed=None):
+    """JSON body the Dash renderer POSTs to run one callback.
+
+    ``output`` is the callback's output id and ``outputs`` its wire form,
+    ``inputs`` lists its input ``{"id", "property"}`` specs and ``values``
+    maps (id, property) to their current values. ``changed`` holds the
+    (id, property) pairs that triggered the call, every input by default.
+    """
+    inputs = [
+        {**spec, "value": values.get((spec["id"], spec["property"]))}
+        for spec in inputs
+    ]
+    if changed is None:
+        changed = [(spec["id"], spec["property"]) for spec in inputs]
+    return {
+        "output": output,
+        "outputs": outputs,
+        "inputs": inputs,
+        "changedPropIds": [f"{id}.{prop}" for id, prop in changed],
+        "state": [],
+    }
+
+
+def callback_request(app, output, values=None):
+    """JSON body the Dash renderer POSTs to run the callback of ``output``.
+
+    ``output`` is a key of ``app.callback_map``. Inputs are taken from
+    ``values`` and then ``SAMPLE_INPUTS``, both keyed by (id, property).
+    """
+    callback = app.callback_map[output]
+    return update_request(
+        output,
+        _wire(callback["output"]),
+        callback["inputs"],
+        {**SAMPLE_INPUTS, **(values or {})},
+    )
+
+
+def server_callbacks(app):
+    """Outputs of the callbacks that run on the server."""
+    return [output for output, cb in app.callback_map.items() if "callback" in cb]
+
+
+def payload_report(app, values=None):
+    """Bytes on the wire for one call of every server callback.
+
+    Each callback is requested uncompressed and with each supported encoding.
+    Sizes are of the response bodies.
+    """
+    client = app.server.test_client()
+    url = f"{app.config.routes_pathname_prefix}_dash-update-component"
+    encodings = ["gzip", "br"] if brotli is not None else ["gzip"]
+
+    rows = []
+    for output in server_callbacks(app):
+        body = callback_request(app, output, values)
+        response = client.post(url, json=body, headers={"Accept-Encoding": "identity"})
+        row = {"callback": output, "identity": len(response.data)}
+        for encoding in encodings:
+            encoded = client.post(url, json=body, headers={"Accept-Encoding": encoding})
+            row[encoding] = len(encoded.data)
+        rows.append(row)
+    return rows
+
+
+def main():
+    argparse.ArgumentParser(
+        description="Report the response size of every callback, before and "
+        "after compression."
+    ).parse_args()
+
+    from src.app import app
+
+    rows = payload_report(app)
+    columns = [c for c in rows[0] if c != "callback"] if rows else []
+    print(f"{'callback':<50}" + "".join(f"{c:>10}" for c in columns))
+    for row in rows:
+        cells = "".join(
+            f"{'-' if row.get(c) is None else row[c]:>10}" for c in columns
+        )
+        print(f"{row['callback'][:50]:<50}{cells}")
+
+
+if __name__ == "__main__":
+    main()
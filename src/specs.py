@@ -0,0 +1,275 @@
+import hashlib
+import importlib.metadata
+import json
+import threading
+from collections import OrderedDict
+
+from src.cache_config import cache
+from src.config import SPEC_CACHE_ENTRIES, SPEC_CACHE_MB
+from src.data import json_values
+from src.metrics import note_cache, phase, timed_phase
+
+# Compiled Vega specs keyed by (chart, *variant), shared by every callback
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def compile_chart(chart):
+    """Compile an Altair chart to a Vega spec without VegaFusion pre-transforms.
+
+    Charts are defined over named, empty datasets so the compiled spec keeps
+    every transform client-side and can be reused with any data.
+    """
+    return chart.to_dict(format="vega", context={"pre_transform": False})
+
+
+def get_template(key, build):
+    """Return the compiled template for ``key``, compiling ``build()`` on first use."""
+    template = _templates.get(key)
+    if template is None:
+        with _templates_lock:
+            template = _templates.get(key)
+            if template is None:
+                with phase("altair"):
+                    template = _templates[key] = compile_chart(build())
+    return template
+
+
+def templates_fingerprint():
+    """Short hash of every compiled template, to version cached specs."""
+    with _templates_lock:
+        payload = json.dumps(
+            sorted(_templates.items(), key=lambda item: repr(item[0])),
+            sort_keys=True,
+            default=str,
+        )
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+
+def code_fingerprint(*modules, settings=None):
+    """Short hash of the source of ``modules`` and the Altair and vl-convert versions.
+
+    Versions cached specs without compiling any template first. ``settings``
+    maps the names of runtime options that shape the specs to their values.
+    """
+    digest = hashlib.sha1()
+    for module in modules:
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    for package in ("altair", "vl-convert-python"):
+        digest.update(importlib.metadata.version(package).encode())
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:12]
+
+
+def clear_templates():
+    """Forget every compiled template."""
+    with _templates_lock:
+        _templates.clear()
+
+
+@timed_phase("render")
+def records(df, columns):
+    """Return ``df[columns]`` as JSON-ready records, with missing values as None."""
+    return json_values(df[columns]).to_dict(orient="records")
+
+
+def _replace_named(items, updates):
+    """Copy the named spec entries that have updates and share the rest."""
+    return [
+        {**item, **updates[item["name"]]} if item.get("name") in updates else item
+        for item in items
+    ]
+
+
+@timed_phase("render")
+def render(template, data=None, title=None, signals=None, scales=None):
+    """Fill a compiled template with per-request values.
+
+    ``data`` maps dataset names to their values, ``signals`` maps signal
+    names to their values and ``scales`` maps scale names to properties such
+    as ``domain`` and ``range``. Only the touched parts of the template are
+    copied, so the returned spec must be treated as read-only.
+    """
+    spec = dict(template)
+    if data:
+        spec["data"] = _replace_named(
+            spec["data"], {name: {"values": values} for name, values in data.items()}
+        )
+    if signals:
+        spec["signals"] = _replace_named(
+            spec["signals"], {name: {"value": value} for name, value in signals.items()}
+        )
+    if scales:
+        spec["scales"] = _replace_named(spec["scales"], scales)
+    if title is not None:
+        spec["title"] = {**spec.get("title", {}), "text": title}
+    return spec
+
+
+def normalize_selection(selected):
+    """Canonical, hashable form of a multi-select dropdown value.
+
+    A single string becomes a one-item selection, any selection containing
+    "(All)" collapses to ``("(All)",)`` and the rest are sorted and deduplicated.
+    """
+    if selected is None:
+        return ()
+    if isinstance(selected, str):
+        selected = [selected]
+    if "(All)" in selected:
+        return ("(All)",)
+    return tuple(sorted(set(selected)))
+
+
+def normalize_clicked_region(clicked_region):
+    """Canonical, hashable form of the map's ``select_region`` signal data."""
+    region = (clicked_region or {}).get("select_region")
+    if not region:
+        return None
+    return normalize_selection(region.get("country"))
+
+
+class SpecCache:
+    """Per-process LRU cache of rendered specs bounded by entries and bytes.
+
+    Sizes are measured as the length of each spec's JSON encoding. Entries
+    larger than the whole byte budget are returned but never stored. A
+    ``max_bytes`` of 0 skips the size accounting and bounds entries only.
+
+    With a ``shared`` Flask-Caching cache, local misses fall through to it
+    and built specs are written back, so worker processes reuse each other's
+    work. Shared keys are prefixed with ``namespace``, which should change
+    whenever the templates do. ``store`` and ``get_or_build`` also take the
+    version of the data a spec was built from, so specs of a replaced
+    dataset are never served.
+    """
+
+    def __init__(self, max_entries, max_bytes, shared=None, namespace=""):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.namespace = namespace
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.shared_errors = 0
+
+    def get(self, key):
+        """Return ``(True, spec)`` for a cached key, or ``(False, None)``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, spec):
+        """Store ``spec`` under ``key``, evicting least recently used entries."""
+        size = 0
+        if self.max_bytes:
+            size = len(json.dumps(spec, separators=(",", ":"), default=str))
+        if self.max_entries <= 0 or (self.max_bytes and size > self.max_bytes):
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (spec, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes and self.bytes > self.max_bytes
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def _shared_key(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return f"spec:{self.namespace}:{digest}"
+
+    def _shared_get(self, key):
+        """Look ``key`` up in the shared cache, treating backend errors as misses."""
+        if self.shared is None:
+            return None
+        try:
+            spec = self.shared.get(self._shared_key(key))
+        except Exception:
+            self.shared_errors += 1
+            return None
+        if spec is None:
+            self.shared_misses += 1
+        else:
+            self.shared_hits += 1
+        return spec
+
+    def _shared_set(self, key, spec):
+        if self.shared is None:
+            return
+        try:
+            self.shared.set(self._shared_key(key), spec)
+        except Exception:
+            self.shared_errors += 1
+
+    def store(self, key, spec, version=""):
+        """Store ``spec`` under ``key`` locally and in the shared cache."""
+        key = (version, key)
+        self._shared_set(key, spec)
+        self.put(key, spec)
+
+    def get_or_build(self, key, build, version=""):
+        """Return the cached spec for ``key``, calling ``build()`` on a miss.
+
+        Lookups go to the local LRU first, then to the shared cache.
+        """
+        key = (version, key)
+        hit, spec = self.get(key)
+        if hit:
+            note_cache("hit")
+            return spec
+
+        spec = self._shared_get(key)
+        if spec is None:
+            note_cache("miss")
+            spec = build()
+            self._shared_set(key, spec)
+        else:
+            note_cache("shared_hit")
+        self.put(key, spec)
+        return spec
+
+    def clear(self):
+        """Drop every entry, keeping the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Counters for sizing the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "shared_hits": self.shared_hits,
+                "shared_misses": self.shared_misses,
+                "shared_errors": self.shared_errors,
+            }
+
+
+# Rendered chart specs keyed by chart name and normalized callback inputs,
+# backed by the cache shared between workers
+spec_cache = SpecCache(SPEC_CACHE_ENTRIES, SPEC_CACHE_MB * 2**20, shared=cache)
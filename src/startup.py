@@ -0,0 +1,83 @@
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+# Seconds spent in each phase of app start-up, in order
+phases = {}
+
+
+@contextlib.contextmanager
+def timed(phase):
+    """Record how long the enclosed block takes as ``phase``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[phase] = round(time.perf_counter() - start, 3)
+
+
+def import_report(module="src.app", env=None):
+    """Import ``module`` in a fresh interpreter and time its imports.
+
+    Returns the import time of each top-level package, summed from the
+    self times ``python -X importtime`` reports for its modules, and the
+    start-up phases recorded while the module ran.
+    """
+    script = (
+        f"import json, {module}\n"
+        "from src.startup import phases\n"
+        "print(json.dumps(phases))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, **(env or {})},
+    )
+
+    packages = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line.split(":", 1)[1].split("|")
+        packages[name.strip().split(".")[0]] += int(self_us) / 1e6
+
+    imports = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "imports": [(package, round(seconds, 3)) for package, seconds in imports],
+        "phases": json.loads(result.stdout.strip().splitlines()[-1]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Break down the start-up time of the app by package and phase."
+    )
+    parser.add_argument("--module", default="src.app", help="Module to import.")
+    parser.add_argument(
+        "--top", type=int, default=15, help="Packages to list (default: 15)."
+    )
+    args = parser.parse_args()
+
+    report = import_report(args.module)
+    imports = report["imports"]
+    print(f"{'package':<30} {'seconds':>8}")
+    for package, seconds in imports[: args.top]:
+        print(f"{package:<30} {seconds:>8.3f}")
+    rest = sum(seconds for _, seconds in imports[args.top :])
+    print(f"{'(other)':<30} {rest:>8.3f}")
+    print(f"{'total':<30} {sum(seconds for _, seconds in imports):>8.3f}")
+    print()
+    print(f"{'phase':<30} {'seconds':>8}")
+    for phase, seconds in report["phases"].items():
+        print(f"{phase:<30} {seconds:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import itertools
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.callbacks import (
+    CLIENT_SIDE,
+    build_bubble_spec,
+    build_client_view_spec,
+    build_continent_metric_spec,
+    build_map_spec,
+    bubble_key,
+    bubble_rows,
+    client_view_key,
+    continent_metric_key,
+    map_key,
+    map_tolerance,
+    metric_rows,
+)
+from src.data import METRIC_LABELS, get_aggregate_cube, get_unique_years
+from src.specs import spec_cache
+
+# Data shared with forked warm-up workers
+_data = {}
+
+
+def continent_selections(continents, all_subsets=False):
+    """Continent dropdown values to warm: "(All)" and each continent on its own.
+
+    With ``all_subsets`` every non-empty combination of continents is included.
+    """
+    continents = sorted(continents)
+    selections = [["(All)"]]
+    sizes = range(1, len(continents) + 1) if all_subsets else [1]
+    for size in sizes:
+        selections.extend(list(c) for c in itertools.combinations(continents, size))
+    return selections
+
+
+def warmup_tasks(df, all_subsets=False):
+    """Enumerate the map, bubble and continent chart inputs to pre-render.
+
+    In client render mode the map and bubble chart are replaced by one
+    browser-filtered view per metric.
+    """
+    years = [int(year) for year in get_unique_years(df, step=1)]
+    selections = continent_selections(df["continent"].dropna().unique(), all_subsets)
+
+    tasks = []
+    if CLIENT_SIDE:
+        tasks.extend(("client_view", (metric,)) for metric in METRIC_LABELS)
+    for selected_continent in selections:
+        if not CLIENT_SIDE:
+            tasks.extend(("map", (selected_continent, year)) for year in years)
+        for selected_metric in METRIC_LABELS:
+            if not CLIENT_SIDE:
+                tasks.extend(
+                    ("bubble", (selected_continent, year, {}, selected_metric))
+                    for year in years
+                )
+            tasks.append(("continent_metric", (selected_metric, selected_continent)))
+    return tasks
+
+
+def _render(task):
+    """Render one warm-up task, returning its spec cache key and spec."""
+    chart, args = task
+    if chart in ("map", "client_view"):
+        # Maps are warmed at the detail tier of the default map width
+        selected_continent = args[0] if chart == "map" else "(All)"
+        tolerance = map_tolerance(
+            _data["geo_df"], _data["geometries"], selected_continent
+        )
+    if chart == "map":
+        return map_key(*args, tolerance), build_map_spec(
+            _data["geo_df"], _data["geometries"], *args, _data["basemap_url"], tolerance
+        )
+    if chart == "bubble":
+        selected_continent, selected_year, clicked_region, selected_metric = args
+        rows = bubble_rows(
+            _data["dataset"], selected_continent, selected_year, selected_metric
+        )
+        return bubble_key(*args), build_bubble_spec(
+            rows, clicked_region, selected_metric
+        )
+    if chart == "client_view":
+        return client_view_key(*args, tolerance), build_client_view_spec(
+            _data["geo_df"], *args, _data["basemap_url"], tolerance
+        )
+    if chart == "continent_metric":
+        rows = metric_rows(_data["dataset"], *args)
+        return continent_metric_key(*args), build_continent_metric_spec(rows, *args)
+    raise ValueError(f"Unknown chart: {chart!r}")
+
+
+def warm_up(data, basemap_url=None, processes=None, all_subsets=False):
+    """Pre-render every chart spec from ``warmup_tasks`` into the spec cache.
+
+    ``data`` is the ``Dataset`` to render from; specs are stored under its
+    version. They are rendered across a pool of forked processes where the
+    platform supports it, and in this process otherwise. The parent stores
+    each spec in its own LRU and in the shared cache. Returns a summary of
+    the run.
+    """
+    start = time.perf_counter()
+
+    # The card aggregates are a single cube per frame
+    get_aggregate_cube(data.geo_df)
+
+    _data.update(data._asdict(), dataset=data, basemap_url=basemap_url)
+    tasks = warmup_tasks(data.df, all_subsets)
+
+    if processes != 1 and "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(processes, mp_context=context) as executor:
+            results = executor.map(_render, tasks, chunksize=16)
+            for key, spec in results:
+                spec_cache.store(key, spec, data.version)
+    else:
+        for task in tasks:
+            spec_cache.store(*_render(task), data.version)
+
+    return {
+        "specs": len(tasks),
+        "seconds": round(time.perf_counter() - start, 2),
+        **spec_cache.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pre-render chart specs into the shared spec cache."
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="Worker processes to render with (default: one per CPU).",
+    )
+    parser.add_argument(
+        "--all-continent-subsets",
+        action="store_true",
+        help="Warm every combination of continents, not just single continents.",
+    )
+    args = parser.parse_args()
+
+    from src.app import app, server
+    from src.callbacks import get_basemap_url
+    from src.data import load_dataset
+
+    with server.app_context():
+        summary = warm_up(
+            load_dataset(),
+            get_basemap_url(app),
+            processes=args.processes,
+            all_subsets=args.all_continent_subsets,
+        )
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
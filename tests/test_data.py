@@ -0,0 +1,125 @@
+import gc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data import (
+    _derived,
+    enforce_schema,
+    get_aggregate_cube,
+    get_frame_index,
+)
+
+
+def make_frame():
+    """Two years of five countries, one without a continent, and a missing GDP."""
+    return enforce_schema(
+        pd.DataFrame(
+            {
+                "country": ["Chile", "Kenya", "Nepal", "Peru", "Atlantis"] * 2,
+                "continent": [
+                    "South America",
+                    "Africa",
+                    "Asia",
+                    "South America",
+                    None,
+                ]
+                * 2,
+                "year": [2000] * 5 + [2001] * 5,
+                "life_exp": [76.8, 52.3, 62.3, 71.0, 90.0]
+                + [77.1, 52.1, 63.0, 71.4, 91.0],
+                "gdp": [10100, 1280, 733, np.nan, 5] + [10300, 1270, 760, 2100, 6],
+                "population": [15.2e6, 31.0e6, 23.9e6, 26.0e6, 1.0] * 2,
+            }
+        )
+    )
+
+
+@pytest.fixture
+def frame():
+    return make_frame()
+
+
+def countries(rows):
+    return sorted(rows["country"].astype(str))
+
+
+def mean(df, column, year, continents=None):
+    rows = df[df["year"] == year]
+    if continents is not None:
+        rows = rows[rows["continent"].isin(continents)]
+    return rows[column].astype("float64").mean()
+
+
+def test_rows_by_year_and_continent(frame):
+    index = get_frame_index(frame)
+
+    assert countries(index.rows(2000, "(All)")) == [
+        "Atlantis",
+        "Chile",
+        "Kenya",
+        "Nepal",
+        "Peru",
+    ]
+    assert countries(index.rows(2001, ["South America"])) == ["Chile", "Peru"]
+    assert countries(index.rows(2001, ["Asia", "Africa"])) == ["Kenya", "Nepal"]
+    assert (index.rows(2001, ["Asia", "Africa"])["year"] == 2001).all()
+    assert index.rows(2001, ["Oceania"]).empty
+    assert index.rows(2001, []).empty
+    assert index.rows(1999, "(All)").empty
+
+
+def test_rows_of_an_unsorted_frame(frame):
+    shuffled = frame.sample(frac=1, random_state=0).reset_index(drop=True)
+    index = get_frame_index(shuffled)
+
+    assert countries(index.rows(2000, ["South America"])) == ["Chile", "Peru"]
+    assert countries(index.rows(2001, "(All)")) == countries(
+        frame[frame["year"] == 2001]
+    )
+
+
+def test_index_is_dropped_with_its_frame():
+    frame = make_frame()
+    before = len(_derived)
+    get_frame_index(frame)
+    get_aggregate_cube(frame)
+    assert len(_derived) == before + 2
+
+    del frame
+    gc.collect()
+    assert len(_derived) == before
+
+
+def test_cube_means_match_the_frame(frame):
+    kpis = get_aggregate_cube(frame).kpis().set_index(["year", "continent", "metric"])
+
+    for year in (2000, 2001):
+        assert kpis.loc[(year, "(All)", "life_exp"), "mean"] == pytest.approx(
+            mean(frame, "life_exp", year)
+        )
+        assert kpis.loc[(year, "(All)", "life_exp"), "rows"] == 5
+        assert kpis.loc[(year, "South America", "gdp"), "mean"] == pytest.approx(
+            mean(frame, "gdp", year, ["South America"])
+        )
+    # Peru's missing 2000 GDP is left out of the mean, not counted as zero
+    assert kpis.loc[(2000, "South America", "gdp"), "mean"] == pytest.approx(10100)
+
+
+def test_cube_changes_and_selections(frame):
+    cube = get_aggregate_cube(frame)
+    kpis = cube.kpis([["Asia", "Africa"]], [2001]).set_index("metric")
+
+    assert list(kpis["year"].unique()) == [2001]
+    assert kpis.loc["life_exp", "continent"] == "Asia, Africa"
+    assert kpis.loc["life_exp", "rows"] == 2
+    assert kpis.loc["life_exp", "mean"] == pytest.approx((52.1 + 63.0) / 2)
+    previous = (52.3 + 62.3) / 2
+    assert kpis.loc["life_exp", "previous"] == pytest.approx(previous)
+    assert kpis.loc["life_exp", "change"] == pytest.approx(
+        ((52.1 + 63.0) / 2 - previous) / previous * 100, rel=1e-5
+    )
+    # The first year has nothing to change from
+    first = cube.kpis(["(All)"], [2000]).set_index("metric")
+    assert np.isnan(first.loc["gdp", "change"])
@@ -0,0 +1,133 @@
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from src.ingest import refresh
+
+HEADER = "country,continent,year,life_exp,hdi_index,co2_consump,gdp,services\n"
+ROWS = [
+    "Chile,South America,2000,76.8,0.753,3.9,10100,61.2\n",
+    "Kenya,Africa,2000,52.3,0.444,0.3,1280,28.7\n",
+    "Nepal,Asia,2000,62.3,0.392,0.1,733,14.3\n",
+]
+NEW_ROWS = [
+    "Chile,South America,2001,77.1,0.758,3.8,10300,61.9\n",
+    "Kenya,Africa,2001,52.1,0.447,0.3,1270,29.0\n",
+]
+
+
+def write_csv(path, lines, mtime_ns):
+    """Write ``lines`` and give the file a known modification time."""
+    with open(path, "w") as f:
+        f.writelines(lines)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def append_csv(path, lines, mtime_ns):
+    with open(path, "a") as f:
+        f.writelines(lines)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def parquet_rows(path):
+    """(country, year, gdp) of every row in the Parquet file, in file order."""
+    df = pd.read_parquet(path)
+    return list(zip(df["country"], df["year"].astype(int), df["gdp"].astype(int)))
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return tmp_path / "raw.csv", str(tmp_path / "processed" / "data.parquet")
+
+
+def test_refresh_builds_skips_appends_and_rebuilds(paths):
+    csv_path, parquet_path = paths
+    write_csv(csv_path, [HEADER, *ROWS], 1_000_000_000)
+
+    assert refresh(csv_path, parquet_path, chunk_rows=2)["mode"] == "rebuild"
+    assert parquet_rows(parquet_path) == [
+        ("Chile", 2000, 10100),
+        ("Kenya", 2000, 1280),
+        ("Nepal", 2000, 733),
+    ]
+    assert refresh(csv_path, parquet_path)["mode"] == "unchanged"
+
+    # A new timestamp on the same content is not a change
+    os.utime(csv_path, ns=(2_000_000_000, 2_000_000_000))
+    assert refresh(csv_path, parquet_path)["mode"] == "unchanged"
+
+    # Appended rows are ingested on their own and the old row groups kept
+    append_csv(csv_path, NEW_ROWS, 3_000_000_000)
+    row_groups = pq.ParquetFile(parquet_path).num_row_groups
+    summary = refresh(csv_path, parquet_path, chunk_rows=2)
+    assert summary["mode"] == "append"
+    assert summary["rows_read"] == 2
+    assert pq.ParquetFile(parquet_path).num_row_groups == row_groups + 1
+    assert parquet_rows(parquet_path)[3:] == [
+        ("Chile", 2001, 10300),
+        ("Kenya", 2001, 1270),
+    ]
+    assert refresh(csv_path, parquet_path)["mode"] == "unchanged"
+
+    # An edit in the middle of the file, even of the same size, rebuilds
+    lines = [HEADER, *ROWS, *NEW_ROWS]
+    lines[2] = lines[2].replace("1280", "1290")
+    write_csv(csv_path, lines, 4_000_000_000)
+    summary = refresh(csv_path, parquet_path)
+    assert summary["mode"] == "rebuild"
+    assert summary["rows_read"] == 5
+    assert parquet_rows(parquet_path) == [
+        ("Chile", 2000, 10100),
+        ("Kenya", 2000, 1290),
+        ("Nepal", 2000, 733),
+        ("Chile", 2001, 10300),
+        ("Kenya", 2001, 1270),
+    ]
+
+
+def test_append_to_an_unterminated_last_line_rebuilds(paths):
+    csv_path, parquet_path = paths
+    # The last row has no newline, so "appended" text continues that row
+    write_csv(csv_path, [HEADER, *ROWS[:-1], ROWS[-1].rstrip("\n")], 1_000_000_000)
+    assert refresh(csv_path, parquet_path)["mode"] == "rebuild"
+
+    append_csv(csv_path, ["7\n", *NEW_ROWS], 2_000_000_000)
+    summary = refresh(csv_path, parquet_path)
+    assert summary["mode"] == "rebuild"
+    # Nepal's services went from 14.3 to 14.37, and the new rows follow it
+    services = pd.read_parquet(parquet_path)["services"]
+    assert services[2] == pytest.approx(14.37)
+    assert parquet_rows(parquet_path) == [
+        ("Chile", 2000, 10100),
+        ("Kenya", 2000, 1280),
+        ("Nepal", 2000, 733),
+        ("Chile", 2001, 10300),
+        ("Kenya", 2001, 1270),
+    ]
+
+
+def test_rows_with_missing_values_are_dropped(paths):
+    csv_path, parquet_path = paths
+    write_csv(csv_path, [HEADER, ROWS[0], "Peru,South America,2000,,,,,\n"], 10**9)
+
+    summary = refresh(csv_path, parquet_path)
+    assert (summary["rows_read"], summary["rows_written"]) == (2, 1)
+    assert parquet_rows(parquet_path) == [("Chile", 2000, 10100)]
+
+
+def test_up_to_date_file_is_not_written(paths):
+    csv_path, parquet_path = paths
+    write_csv(csv_path, [HEADER, *ROWS], 1_000_000_000)
+    refresh(csv_path, parquet_path)
+    lock_path = f"{parquet_path}.lock"
+    if os.path.exists(lock_path):
+        os.remove(lock_path)
+    mtime_ns = os.stat(parquet_path).st_mtime_ns
+
+    os.utime(csv_path, ns=(2_000_000_000, 2_000_000_000))
+    assert refresh(csv_path, parquet_path)["mode"] == "unchanged"
+    # Neither the lock file nor the Parquet file is touched
+    assert not os.path.exists(lock_path)
+    assert os.stat(parquet_path).st_mtime_ns == mtime_ns
@@ -0,0 +1,105 @@
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import flask
+import pytest
+from fakeredis import TcpFakeServer
+from flask_caching import Cache
+
+from src.cache_config import PROJECT_ROOT, cache_settings
+from src.specs import SpecCache
+
+SPEC = {"data": [{"name": "points", "values": [{"x": 1, "y": 2}]}]}
+
+
+@pytest.fixture
+def redis_url():
+    """URL of a fakeredis server on a free local port, standing in for Redis."""
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    yield f"redis://{host}:{port}/0"
+    server.shutdown()
+    server.server_close()
+
+
+def shared_cache(monkeypatch, url, timeout=None):
+    monkeypatch.setenv("LV_CACHE_REDIS_URL", url)
+    config = cache_settings("redis")
+    if timeout is not None:
+        config["CACHE_DEFAULT_TIMEOUT"] = timeout
+    app = flask.Flask(__name__)
+    cache = Cache(config=config)
+    cache.init_app(app)
+    return cache
+
+
+def never_built():
+    raise AssertionError("spec was built instead of read from the shared cache")
+
+
+def test_spec_built_in_another_process_is_a_shared_hit(monkeypatch, redis_url):
+    script = textwrap.dedent(
+        f"""
+        import flask
+        from flask_caching import Cache
+        from src.cache_config import cache_settings
+        from src.specs import SpecCache
+
+        app = flask.Flask(__name__)
+        cache = Cache(config=cache_settings("redis"))
+        cache.init_app(app)
+        SpecCache(8, 0, shared=cache, namespace="test").store(
+            ("bubble", 2010), {SPEC!r}, "v1"
+        )
+        """
+    )
+    subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=PROJECT_ROOT,
+        env={
+            **os.environ,
+            "LV_CACHE_REDIS_URL": redis_url,
+            "LV_CACHE_BACKEND": "simple",
+        },
+        check=True,
+    )
+
+    cache = shared_cache(monkeypatch, redis_url)
+    specs = SpecCache(8, 0, shared=cache, namespace="test")
+    assert specs.get_or_build(("bubble", 2010), never_built, "v1") == SPEC
+    assert specs.shared_hits == 1
+    # Another dataset version or template namespace does not see the entry
+    assert specs.get_or_build(("bubble", 2010), lambda: {}, "v2") == {}
+    other = SpecCache(8, 0, shared=specs.shared, namespace="other")
+    assert other.get_or_build(("bubble", 2010), lambda: {}, "v1") == {}
+
+
+def test_shared_entries_expire(monkeypatch, redis_url):
+    cache = shared_cache(monkeypatch, redis_url, timeout=1)
+    SpecCache(8, 0, shared=cache).store("map", SPEC)
+
+    reader = SpecCache(8, 0, shared=cache)
+    assert reader.get_or_build("map", never_built) == SPEC
+
+    time.sleep(1.5)
+    reader = SpecCache(8, 0, shared=cache)
+    assert reader.get_or_build("map", lambda: {"rebuilt": True}) == {"rebuilt": True}
+    assert reader.shared_misses == 1
+
+
+def test_backend_errors_count_as_misses(monkeypatch):
+    cache = shared_cache(monkeypatch, "redis://127.0.0.1:1/0")
+    specs = SpecCache(8, 0, shared=cache)
+
+    assert specs.get_or_build("map", lambda: SPEC) == SPEC
+    # Both the lookup and the write back failed, and the spec is still served
+    assert specs.shared_errors == 2
+    assert specs.shared_hits == 0
+    assert specs.get_or_build("map", never_built) == SPEC
+    assert specs.hits == 1